@@ -0,0 +1,126 @@
+"""Check and time the media classifier against the original get_dynamic_path.
+
+Run from the repository root:
+
+    python bench/bench_classifier.py
+
+Every name in media_names.txt must classify to the same library path as the
+original implementation, and the uncached classifier must not be slower.
+"""
+
+import os
+import re
+import sys
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from utils.media_classifier import classify_media  # noqa: E402
+
+ROUNDS = 5
+
+
+def reference_sanitize_name(name):
+    name = re.sub(r"\.", " ", name)
+    return re.sub(r"[^\w\s-]", "", name).strip()
+
+
+def reference_dynamic_path(file_name):
+    """get_dynamic_path as it was before the classifier, kept verbatim"""
+    sanitize_name = reference_sanitize_name
+    name, extension = os.path.splitext(file_name)
+
+    # Check if it's a TV show
+    tv_match = re.search(r"(.*?)S(\d+)E(\d+)", name, re.IGNORECASE)
+    if tv_match:
+        # Extract base show name and clean it
+        show_name = sanitize_name(tv_match.group(1).strip())
+        season = int(tv_match.group(2))
+        episode = int(tv_match.group(3))
+
+        # Extract quality if present in square brackets
+        quality_match = re.search(r"\[(.*?)\]", name)
+        quality_suffix = f" [{quality_match.group(1)}]" if quality_match else ""
+
+        # Check for year in the show name
+        year_match = re.search(r"(.*?)[(\s](\d{4})[)\s]", name)
+        if year_match:
+            # Remove year from show name if it exists and format properly
+            clean_show_name = sanitize_name(year_match.group(1).strip())
+            year = year_match.group(2)
+            show_folder = f"{clean_show_name} ({year})"
+            plex_file_name = f"{clean_show_name} - s{season:02d}e{episode:02d}{quality_suffix}{extension.lower()}"
+        else:
+            show_folder = show_name
+            plex_file_name = f"{show_name} - s{season:02d}e{episode:02d}{quality_suffix}{extension.lower()}"
+
+        return os.path.join(
+            "tv-shows", show_folder, f"Season {season:02d}", plex_file_name
+        )
+    else:
+        # Updated movie handling to match Radarr format
+        movie_match = re.search(r"(.*?)(\d{4})", name)
+        if movie_match:
+            movie_name = sanitize_name(movie_match.group(1).strip())
+            year = movie_match.group(2)
+
+            # Extract quality if present in square brackets
+            quality_match = re.search(r"\[(.*?)\]", name)
+            quality_suffix = f" {quality_match.group(1)}" if quality_match else ""
+
+            plex_file_name = f"{movie_name} ({year}){quality_suffix}{extension.lower()}"
+        else:
+            movie_name = sanitize_name(name)
+            # Extract quality if present in square brackets
+            quality_match = re.search(r"\[(.*?)\]", name)
+            quality_suffix = f" {quality_match.group(1)}" if quality_match else ""
+            plex_file_name = f"{movie_name}{quality_suffix}{extension.lower()}"
+
+        return os.path.join("movies", plex_file_name)
+
+
+def load_corpus():
+    with open(os.path.join(HERE, "media_names.txt"), encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def best_time(func, names):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = perf_counter()
+        for name in names:
+            func(name)
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def main():
+    names = load_corpus()
+    uncached = classify_media.__wrapped__
+
+    mismatches = [
+        (name, reference_dynamic_path(name), uncached(name).path)
+        for name in names
+        if uncached(name).path != reference_dynamic_path(name)
+    ]
+    for name, expected, actual in mismatches[:10]:
+        print(f"MISMATCH {name!r}\n  expected {expected}\n  got      {actual}")
+    assert not mismatches, f"{len(mismatches)} of {len(names)} names differ"
+
+    reference = best_time(reference_dynamic_path, names)
+    single_pass = best_time(uncached, names)
+    classify_media.cache_clear()
+    classify_media("warm-up")
+    cached = best_time(classify_media, names)
+
+    per_name = 1e6 / len(names)
+    print(f"{len(names)} names, all paths identical to get_dynamic_path")
+    print(f"original get_dynamic_path: {reference * per_name:6.2f} µs/name")
+    print(f"classify_media, uncached:  {single_pass * per_name:6.2f} µs/name")
+    print(f"classify_media, memoized:  {cached * per_name:6.2f} µs/name")
+    assert single_pass <= reference, "single-pass classifier is slower than before"
+
+
+if __name__ == "__main__":
+    main()
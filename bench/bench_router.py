@@ -0,0 +1,107 @@
+"""Dispatch cost per update as the number of commands grows.
+
+Registers N commands on a Router and dispatches synthetic updates to them,
+then does the same with one pattern-filtered handler per command, which is
+how handlers were registered with Telethon before the Router: every update
+was matched against every handler's pattern. Run from the repository root:
+
+    python bench/bench_router.py --commands 10,100,1000
+
+Asserts each update reached exactly its own command, that the Router's cost
+per update stays flat as commands are added, and that it beats the
+per-handler scan at the largest size.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+from time import perf_counter
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from handlers.router import Router  # noqa: E402
+
+UPDATES = 20000
+
+
+class PatternHandlers:
+    """One handler per command, each checked against every update"""
+
+    def __init__(self):
+        self.handlers = []
+
+    def command(self, name):
+        def decorator(func):
+            self.handlers.append(
+                (re.compile(f"/{name}(?:@\\S+)?(?:\\s|$)").match, func)
+            )
+            return func
+
+        return decorator
+
+    async def dispatch_message(self, event):
+        for pattern, func in self.handlers:
+            if pattern(event.raw_text):
+                await func(event)
+
+
+def make_handler(name, hits):
+    async def handler(event):
+        hits.append((name, event.raw_text))
+
+    handler.__name__ = name
+    return handler
+
+
+def make_events(commands):
+    return [
+        SimpleNamespace(sender_id=1, raw_text=f"/cmd{i * 7919 % commands} arg")
+        for i in range(UPDATES)
+    ]
+
+
+async def time_dispatch(dispatcher, events):
+    started = perf_counter()
+    for event in events:
+        await dispatcher.dispatch_message(event)
+    return (perf_counter() - started) / len(events) * 1e6
+
+
+def run(dispatcher, commands):
+    hits = []
+    for i in range(commands):
+        dispatcher.command(f"cmd{i}")(make_handler(f"cmd{i}", hits))
+    events = make_events(commands)
+    per_update = asyncio.run(time_dispatch(dispatcher, events))
+    assert len(hits) == len(events), f"{len(hits)} of {len(events)} dispatched"
+    for name, text in hits:
+        assert text.split()[0] == f"/{name}", f"{text!r} reached {name}"
+    return per_update
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--commands", default="10,100,1000")
+    args = parser.parse_args()
+
+    sizes = [int(count) for count in args.commands.split(",")]
+    router_costs, pattern_costs = {}, {}
+    for commands in sizes:
+        router_costs[commands] = run(Router(), commands)
+        pattern_costs[commands] = run(PatternHandlers(), commands)
+        print(
+            f"{commands:5d} commands: Router {router_costs[commands]:7.2f} µs/update, "
+            f"pattern per handler {pattern_costs[commands]:8.2f} µs/update"
+        )
+
+    smallest, largest = min(sizes), max(sizes)
+    assert router_costs[largest] < 2 * router_costs[smallest], "Router cost grows"
+    assert router_costs[largest] < pattern_costs[largest], "Router slower than scan"
+
+
+if __name__ == "__main__":
+    main()
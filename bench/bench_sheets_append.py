@@ -0,0 +1,94 @@
+"""Row append throughput with and without the Sheets write queue.
+
+N simulated users each record several sales one after another against a
+local fake Sheets server. The same workload runs twice: with one
+values.append request per row, as the bot used to send, and through
+SheetsWriteQueue. Run from the repository root:
+
+    python bench/bench_sheets_append.py --users 20 --latency-ms 50
+
+Asserts every row arrived exactly once, in order for each user, and that the
+queue sent fewer requests than rows.
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from fake_sheets import FakeSheetsServer, attach_fake_services
+
+from plugins.google_sheets import EnhancedGoogleSheetsModule
+
+
+async def append_unbatched(sheets, workbook_id, worksheet_name, values):
+    """One values.append request per row, like the code before the queue"""
+    request = (
+        sheets.service.spreadsheets()
+        .values()
+        .append(
+            spreadsheetId=workbook_id,
+            range=f"{worksheet_name}!A1",
+            valueInputOption="USER_ENTERED",
+            insertDataOption="INSERT_ROWS",
+            body={"values": [values]},
+        )
+    )
+    return await sheets.transport.execute(request)
+
+
+async def run(server, append, users, rows):
+    sheets = attach_fake_services(EnhancedGoogleSheetsModule(), server)
+    server.appended.clear()
+    server.requests["append"] = 0
+
+    async def user(number):
+        for row in range(rows):
+            await append(sheets, "wb", "Sales", [f"user{number}", str(row)])
+
+    started = perf_counter()
+    await asyncio.gather(*(user(number) for number in range(users)))
+    elapsed = perf_counter() - started
+    await sheets.close()
+    return elapsed, server.requests["append"], list(server.appended)
+
+
+def check_rows(appended, users, rows):
+    assert len(appended) == users * rows, f"{len(appended)} of {users * rows} rows"
+    last_seen = {}
+    for name, row in appended:
+        assert int(row) == last_seen.get(name, -1) + 1, f"{name} out of order"
+        last_seen[name] = int(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    total = args.users * args.rows
+    results = {}
+    with FakeSheetsServer(latency=args.latency_ms / 1000) as server:
+        for label, append in (
+            ("one request per row", append_unbatched),
+            ("SheetsWriteQueue", EnhancedGoogleSheetsModule.append_row),
+        ):
+            elapsed, requests, appended = asyncio.run(
+                run(server, append, args.users, args.rows)
+            )
+            check_rows(appended, args.users, args.rows)
+            results[label] = (elapsed, requests)
+            print(
+                f"{label:20} {total / elapsed:7.1f} rows/s, "
+                f"{requests:4d} requests for {total} rows"
+            )
+
+    before, _ = results["one request per row"]
+    after, requests = results["SheetsWriteQueue"]
+    assert requests < total, "write queue did not batch any rows"
+    assert after < before, "write queue is slower than one request per row"
+
+
+if __name__ == "__main__":
+    main()
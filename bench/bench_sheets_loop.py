@@ -0,0 +1,91 @@
+"""Event-loop latency while many users hit Google Sheets at once.
+
+N simulated users each run /list_workbooks (a Drive files.list) and
+/record_payment (a product read plus a row append) against a local fake
+Sheets server. The same workload runs twice: through GoogleApiTransport, and
+with requests executed directly on the loop as the bot used to. A ticker
+task measures how late the loop wakes it up. Run from the repository root:
+
+    python bench/bench_sheets_loop.py --users 20 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from fake_sheets import FakeSheetsServer, attach_fake_services
+
+from modules.google_transport import GoogleApiTransport
+from plugins.google_sheets import EnhancedGoogleSheetsModule
+from utils.helpers import percentile
+
+TICK = 0.005
+
+
+class OnLoopTransport(GoogleApiTransport):
+    """Executes requests synchronously on the event loop, like the old code"""
+
+    async def execute(self, request):
+        return self._execute(request)
+
+
+async def measure_lag(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(loop.time() - expected, 0) * 1000)
+
+
+async def user(sheets, rounds):
+    for _ in range(rounds):
+        await sheets.list_workbooks()
+        await sheets.get_values("wb", "Products!A:D")
+        await sheets.append_row("wb", "Sales", ["P0001", "500", "2026-01-01", "0"])
+
+
+async def run(server, transport_class, users, rounds):
+    sheets = attach_fake_services(EnhancedGoogleSheetsModule(), server)
+    sheets._transport = transport_class(sheets.credentials)
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.ensure_future(measure_lag(lags, stop))
+    started = perf_counter()
+    await asyncio.gather(*(user(sheets, rounds) for _ in range(users)))
+    elapsed = perf_counter() - started
+    stop.set()
+    await ticker
+    await sheets.close()
+    return elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    results = {}
+    with FakeSheetsServer(latency=args.latency_ms / 1000) as server:
+        for label, transport_class in (
+            ("on the loop (before)", OnLoopTransport),
+            ("GoogleApiTransport", GoogleApiTransport),
+        ):
+            elapsed, lags = asyncio.run(
+                run(server, transport_class, args.users, args.rounds)
+            )
+            results[label] = (elapsed, lags)
+            print(
+                f"{label:22} {elapsed:6.2f}s total, loop lag "
+                f"p50 {percentile(lags, 50):6.1f} ms, "
+                f"p99 {percentile(lags, 99):6.1f} ms, max {max(lags):6.1f} ms"
+            )
+
+    _, before = results["on the loop (before)"]
+    _, after = results["GoogleApiTransport"]
+    assert max(after) < max(before), "transport did not reduce loop stalls"
+    assert percentile(after, 99) < args.latency_ms, "loop stalled for a round trip"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""A local fake of the Sheets and Drive endpoints the bot calls, for benchmarks.
+
+Runs an HTTP server in a background thread with a fixed per-request latency
+and builds real googleapiclient services that talk to it, so requests go
+through the same GoogleApiTransport/httplib2 stack as in production.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import unquote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+from googleapiclient.discovery import build_from_document  # noqa: E402
+
+from modules.google_discovery import (  # noqa: E402
+    CachedResource,
+    get_discovery_document,
+)
+
+VALUES_PATH = re.compile(r"/v4/spreadsheets/([^/]+)/values/([^:?]+)(:append)?")
+
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, products=200):
+        super().__init__(("127.0.0.1", 0), FakeSheetsHandler)
+        self.latency = latency
+        self.products = [
+            [f"P{i:04d}", f"Product {i}", "Active", str(100 + i)]
+            for i in range(products)
+        ]
+        self.appended = []
+        self.requests = {"get": 0, "append": 0, "files": 0}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, kind, rows=()):
+        with self._lock:
+            self.requests[kind] += 1
+            self.appended.extend(rows)
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        sleep(self.server.latency)
+        if self.path.startswith("/drive/v3/files"):
+            self.server.count("files")
+            self._reply({"files": [{"id": "wb", "name": "Sales tracking"}]})
+            return
+        match = VALUES_PATH.match(self.path)
+        self.server.count("get")
+        self._reply({"range": unquote(match.group(2)), "values": self.server.products})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        sleep(self.server.latency)
+        rows = json.loads(body or b"{}").get("values", [])
+        self.server.count("append", rows)
+        self._reply({"updates": {"updatedRows": len(rows)}})
+
+
+def attach_fake_services(sheets, server):
+    """Point a GoogleSheetsModule at the fake server instead of Google"""
+    credentials = AnonymousCredentials()
+    sheets._credentials = credentials
+    # Same wrapping as build_service, with the endpoints moved to the fake
+    sheets._service = CachedResource(
+        build_from_document(
+            get_discovery_document("sheets", "v4"),
+            credentials=credentials,
+            client_options={"api_endpoint": f"{server.url}/"},
+        )
+    )
+    sheets._drive_service = CachedResource(
+        build_from_document(
+            get_discovery_document("drive", "v3"),
+            credentials=credentials,
+            client_options={"api_endpoint": f"{server.url}/drive/v3/"},
+        )
+    )
+    return sheets
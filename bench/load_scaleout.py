@@ -0,0 +1,164 @@
+"""Load generator for BOT_MODE=scaleout, without Telegram.
+
+Builds synthetic new-message updates for many chats, with their users
+attached the way Telethon attaches them on receipt, and feeds them one at a
+time through WorkerPool.forward as the ingress client does. Spawned workers
+dispatch them with ChatOrderedDispatcher into a fake client whose handler
+burns some CPU and waits on simulated I/O. Run from the repository root:
+
+    python bench/load_scaleout.py --workers 1,2,4
+
+Reports throughput and end-to-end latency per worker count, and asserts
+every update arrived exactly once and in order within its chat.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+from datetime import datetime, timezone
+from time import perf_counter, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from telethon.tl import types  # noqa: E402
+
+from utils.helpers import percentile  # noqa: E402
+from worker_pool import (  # noqa: E402
+    ChatOrderedDispatcher,
+    WorkerPool,
+    update_chat_id,
+)
+
+
+class FakeEntityCache:
+    def extend(self, users, chats):
+        pass
+
+
+class FakeSession:
+    def process_entities(self, entities):
+        pass
+
+
+class FakeClient:
+    """Stands in for a worker's TelegramClient; the handler is simulated"""
+
+    def __init__(self, cpu_ms, io_ms):
+        self.session = FakeSession()
+        self._mb_entity_cache = FakeEntityCache()
+        self.cpu_seconds = cpu_ms / 1000
+        self.io_seconds = io_ms / 1000
+        self.handled = []
+
+    async def _dispatch_update(self, update):
+        deadline = perf_counter() + self.cpu_seconds
+        while perf_counter() < deadline:
+            pass
+        await asyncio.sleep(self.io_seconds)
+        message = update.message
+        sent_at = float(message.message)
+        self.handled.append((update_chat_id(update), message.id, time() - sent_at))
+
+
+def make_update(message_id, chat_id):
+    message = types.Message(
+        id=message_id,
+        peer_id=types.PeerUser(chat_id),
+        date=datetime.now(timezone.utc),
+        message=repr(time()),
+        from_id=types.PeerUser(chat_id),
+    )
+    update = types.UpdateNewMessage(message=message, pts=message_id, pts_count=1)
+    # What TelegramClient._preprocess_updates attaches to every update
+    user = types.User(id=chat_id, access_hash=chat_id, first_name="Load")
+    update._entities = {chat_id: user}
+    return update
+
+
+def worker(index, queue, results, cpu_ms, io_ms):
+    async def run():
+        client = FakeClient(cpu_ms, io_ms)
+        dispatcher = ChatOrderedDispatcher(client)
+        loop = asyncio.get_running_loop()
+        results.put("ready")
+        while True:
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            dispatcher.submit(*item)
+        await dispatcher.drain()
+        return client.handled
+
+    results.put(asyncio.run(run()))
+
+
+async def ingress(pool, updates, chats):
+    # The ingress client runs with sequential_updates=True: one forward at a time
+    for message_id in range(1, updates + 1):
+        await pool.forward(make_update(message_id, 1000 + message_id % chats))
+
+
+def run_load(workers, updates, chats, cpu_ms, io_ms, queue_size):
+    results = multiprocessing.get_context("spawn").Queue()
+    pool = WorkerPool(
+        workers, target=worker, args=(results, cpu_ms, io_ms), queue_size=queue_size
+    )
+    pool.start()
+    # Spawned workers import the bot's modules first; keep that out of the timing
+    for _ in pool.processes:
+        assert results.get() == "ready"
+
+    started = perf_counter()
+    asyncio.run(ingress(pool, updates, chats))
+    for queue in pool.queues:
+        queue.put(None)
+
+    handled = []
+    for _ in pool.processes:
+        handled.extend(results.get())
+    elapsed = perf_counter() - started
+    for process in pool.processes:
+        process.join()
+    return handled, elapsed
+
+
+def check_order(handled, updates):
+    assert len(handled) == updates, f"{len(handled)} of {updates} updates handled"
+    last_seen = {}
+    for chat_id, message_id, _ in handled:
+        assert message_id > last_seen.get(chat_id, 0), f"chat {chat_id} out of order"
+        last_seen[chat_id] = message_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--cpu-ms", type=float, default=2.0)
+    parser.add_argument("--io-ms", type=float, default=20.0)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(
+        f"{args.updates} updates over {args.chats} chats, handlers use "
+        f"{args.cpu_ms} ms CPU + {args.io_ms} ms I/O"
+    )
+    for workers in (int(count) for count in args.workers.split(",")):
+        handled, elapsed = run_load(
+            workers, args.updates, args.chats, args.cpu_ms, args.io_ms, args.queue_size
+        )
+        check_order(handled, args.updates)
+        latencies = [latency * 1000 for _, _, latency in handled]
+        print(
+            f"{workers} worker(s): {args.updates / elapsed:7.0f} updates/s, "
+            f"latency p50 {percentile(latencies, 50):6.0f} ms, "
+            f"p99 {percentile(latencies, 99):6.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -19,3 +19,55 @@ USER_ROLES = {
         if ":" in user_role
     ]
 }
+GOOGLE_API_MAX_WORKERS = int(os.getenv("GOOGLE_API_MAX_WORKERS", "4"))
+GOOGLE_API_TIMEOUT = int(os.getenv("GOOGLE_API_TIMEOUT", "30"))
+PRODUCT_CACHE_TTL = int(os.getenv("PRODUCT_CACHE_TTL", "300"))
+SHEETS_APPEND_WINDOW = float(os.getenv("SHEETS_APPEND_WINDOW", "0.25"))
+SHEETS_APPEND_MAX_BATCH = int(os.getenv("SHEETS_APPEND_MAX_BATCH", "100"))
+DOWNLOAD_CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", "4"))
+DOWNLOAD_PART_SIZE = int(os.getenv("DOWNLOAD_PART_SIZE", str(4 * 1024 * 1024)))
+DOWNLOAD_MAX_CONCURRENT = int(os.getenv("DOWNLOAD_MAX_CONCURRENT", "2"))
+DOWNLOAD_MAX_PER_USER = int(os.getenv("DOWNLOAD_MAX_PER_USER", "1"))
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(DOWNLOAD_DIR, ".rpa-bot"))
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", os.path.join(STATE_DIR, "dedup.sqlite3"))
+DISK_LEDGER_DB_PATH = os.getenv(
+    "DISK_LEDGER_DB_PATH", os.path.join(STATE_DIR, "disk.sqlite3")
+)
+DEDUP_HASH_CONTENT = os.getenv("DEDUP_HASH_CONTENT", "false").lower() == "true"
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "5"))
+ALERT_DIGEST_WINDOW = float(os.getenv("ALERT_DIGEST_WINDOW", "30"))
+ALERT_TIMEOUT = float(os.getenv("ALERT_TIMEOUT", "10"))
+POST_PROCESS_WORKERS = int(os.getenv("POST_PROCESS_WORKERS", "2"))
+POST_PROCESS_MAX_PENDING = int(os.getenv("POST_PROCESS_MAX_PENDING", "4"))
+MEDIA_PROBE_ENABLED = os.getenv("MEDIA_PROBE_ENABLED", "false").lower() == "true"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv(
+    "SESSION_DB_PATH", os.path.join(STATE_DIR, "sessions.sqlite3")
+)
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+BOT_MODE = os.getenv("BOT_MODE", "single")
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "2"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+ZOHO_TIMEOUT = int(os.getenv("ZOHO_TIMEOUT", "30"))
+ZOHO_MAX_CONNECTIONS = int(os.getenv("ZOHO_MAX_CONNECTIONS", "10"))
+ZOHO_CONTACTS_TTL = int(os.getenv("ZOHO_CONTACTS_TTL", "600"))
+ZOHO_CONTACTS_FULL_SYNC = int(os.getenv("ZOHO_CONTACTS_FULL_SYNC", "86400"))
+ZOHO_BULK_CONCURRENCY = int(os.getenv("ZOHO_BULK_CONCURRENCY", "4"))
+ZOHO_BULK_MAX_CONCURRENCY = int(os.getenv("ZOHO_BULK_MAX_CONCURRENCY", "10"))
+ZOHO_BULK_MAX_RETRIES = int(os.getenv("ZOHO_BULK_MAX_RETRIES", "5"))
+ZOHO_TOKEN_FILE = os.getenv("ZOHO_TOKEN_FILE", "zoho_tokens.json")
+ZOHO_TOKEN_LEGACY_FILE = os.getenv("ZOHO_TOKEN_LEGACY_FILE", "zoho_tokens.json")
+ZOHO_TOKEN_SAVE_DELAY = float(os.getenv("ZOHO_TOKEN_SAVE_DELAY", "0.5"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8080"))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "1.0"))
+REORGANIZE_WORKERS = int(os.getenv("REORGANIZE_WORKERS", "4"))
+REORGANIZE_BATCH_SIZE = int(os.getenv("REORGANIZE_BATCH_SIZE", "500"))
+DISK_RESERVE_HEADROOM = int(os.getenv("DISK_RESERVE_HEADROOM", str(1024**3)))
+PLEX_URL = os.getenv("PLEX_URL")
+PLEX_TOKEN = os.getenv("PLEX_TOKEN")
+PLEX_SECTION_ID = os.getenv("PLEX_SECTION_ID")
+PLEX_MEDIA_ROOT = os.getenv("PLEX_MEDIA_ROOT", DOWNLOAD_DIR)
+PLEX_TIMEOUT = float(os.getenv("PLEX_TIMEOUT", "10"))
+ALBUM_WINDOW = float(os.getenv("ALBUM_WINDOW", "2"))
+PARTIAL_MAX_AGE = int(os.getenv("PARTIAL_MAX_AGE", str(24 * 3600)))
@@ -1,7 +1,13 @@
 from .command_handlers import register_command_handlers
 from .message_handlers import register_message_handlers
+from .router import Router
+from modules.notifier import admin_notifier
 
 
 def register_handlers(client, plugins):
-    register_command_handlers(client, plugins)
-    register_message_handlers(client, plugins)
+    router = Router()
+    register_command_handlers(router, plugins)
+    register_message_handlers(router, plugins)
+    router.attach(client)
+    admin_notifier.attach(client)
+    return router
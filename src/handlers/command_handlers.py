@@ -1,12 +1,22 @@
-from telethon import events, Button
+from telethon import Button
 from utils.bot_commands import get_commands_description
-from utils.auth import require_auth
-from config import USER_ROLES
+from modules.product_catalog import ProductCatalogCache, get_cell
+from modules.file_downloader import download_scheduler
+from modules.dedup_index import dedup_index
+from modules.disk_space import disk_space
+from modules.bulk_invoicing import BulkInvoicer
+from modules.library_reorganizer import LibraryReorganizer
+from modules.metrics import metrics
+from utils.helpers import format_size
+from utils.session_store import session_store
+import asyncio
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
-WORKBOOK_CACHE = {}
+ADMIN = ("admin",)
+PAYMENT_PAGE_SIZE = 10
+PAYMENT_PREFIX_MAX_BYTES = 40
 
 PAYMENT_CONFIGS = {
     "sales_tracking": {
@@ -20,6 +30,7 @@ PAYMENT_CONFIGS = {
                 "customer_name": 4,  # Column B (index 0)
                 "weekly_installment": 13,  # Column D (index 2)
                 "other_info": 3,  # Column E (index 3)
+                "active": 15,  # Column P (index 15)
             },
         },
         "columns": {"product_id": 0, "amount": 2, "date": 3, "days_late": 4},
@@ -32,12 +43,65 @@ async def handle_error(event, error, message="An error occurred"):
     await event.reply(f"❌ {message}: {str(error)}")
 
 
-async def create_workbook_buttons(workbooks):
-    WORKBOOK_CACHE.clear()
+def build_payment_page(catalog, offset, prefix=""):
+    columns = PAYMENT_CONFIGS["sales_tracking"]["product_data"]["columns"]
+    # Callback data is limited to 64 bytes, so keep the search prefix short
+    prefix = prefix.encode()[:PAYMENT_PREFIX_MAX_BYTES].decode(errors="ignore")
+    rows, total = catalog.page(offset, PAYMENT_PAGE_SIZE, prefix)
+
+    buttons = []
+    for row in rows:
+        product_id = get_cell(row, columns["product_id"])
+        customer_name = get_cell(row, columns["customer_name"])
+        weekly_installment = get_cell(row, columns["weekly_installment"])
+
+        button_text = (
+            f"📦 {product_id} | {customer_name}\n" f"💰 Weekly: {weekly_installment}"
+        )
+        buttons.append([Button.inline(button_text, data=f"payment_prod:{product_id}")])
+
+    if not buttons:
+        return None, []
+
+    navigation = []
+    if offset > 0:
+        previous_offset = max(offset - PAYMENT_PAGE_SIZE, 0)
+        navigation.append(
+            Button.inline("⬅️ Prev", data=f"payment_page:{previous_offset}:{prefix}")
+        )
+    if offset + PAYMENT_PAGE_SIZE < total:
+        next_offset = offset + PAYMENT_PAGE_SIZE
+        navigation.append(
+            Button.inline("Next ➡️", data=f"payment_page:{next_offset}:{prefix}")
+        )
+    if navigation:
+        buttons.append(navigation)
+
+    page_number = offset // PAYMENT_PAGE_SIZE + 1
+    page_count = (total + PAYMENT_PAGE_SIZE - 1) // PAYMENT_PAGE_SIZE
+    search_info = f"Customer: {prefix}*\n" if prefix else ""
+    text = (
+        "🧾 Record Payment\n\n"
+        f"{search_info}"
+        f"Page {page_number}/{page_count} ({total} active products)\n"
+        "Select a product from the list below:"
+    )
+    return text, buttons
+
+
+async def end_payment_flow(event, session):
+    session.pop("temp_product", None)
+    session.pop("expecting_amount", None)
+    await session_store.save(event, session)
+
+
+async def create_workbook_buttons(workbooks, session):
+    session["workbooks"] = {
+        str(i): {"id": wb["id"], "name": wb["name"]} for i, wb in enumerate(workbooks)
+    }
     return [
         [Button.inline(f"📊 {wb['name']}", data=f"wb:{i}")]
         for i, wb in enumerate(workbooks)
-        if WORKBOOK_CACHE.update({str(i): {"id": wb["id"], "name": wb["name"]}}) or True
     ]
 
 
@@ -50,11 +114,13 @@ async def create_worksheet_buttons(workbook_index, worksheets):
     return buttons
 
 
-def register_command_handlers(client, plugins):
-    @client.on(events.NewMessage(pattern="/help"))
+def register_command_handlers(router, plugins):
+    product_catalogs = ProductCatalogCache(plugins, PAYMENT_CONFIGS)
+
+    @router.command("help")
     async def help_command(event):
         user_id = event.sender_id
-        user_role = USER_ROLES.get(user_id, "guest")
+        user_role = event.user_role
         commands = get_commands_description(user_role)
         await event.reply(
             "Here are a list of things I can do!\n\n"
@@ -64,14 +130,101 @@ def register_command_handlers(client, plugins):
             f"Here are the commands you can use:\n\n{commands}"
         )
 
-    @client.on(events.NewMessage(pattern="/my_id"))
+    @router.command("my_id")
     async def my_id_command(event):
         await event.reply(f"Your Telegram user ID is: {event.sender_id}")
 
-    @client.on(events.NewMessage(pattern="/list_workbooks"))
-    @require_auth("admin")
+    @router.command("queue")
+    async def queue_command(event):
+        is_admin = event.user_role == "admin"
+        lines = []
+        for label, jobs in (
+            ("⬇️ Downloading", download_scheduler.running_jobs()),
+            ("⏳ Queued", download_scheduler.queued_jobs()),
+        ):
+            visible = [j for j in jobs if is_admin or j.user_id == event.sender_id]
+            if visible:
+                lines.append(f"{label}:")
+                lines.extend(
+                    f"#{j.id} {j.file_name} ({format_size(j.size)})" for j in visible
+                )
+
+        if not lines:
+            await event.reply("No downloads in progress.")
+            return
+
+        await event.reply(
+            "\n".join(lines) + "\n\nUse /cancel_download <id> to cancel a download."
+        )
+
+    @router.command("cancel_download")
+    async def cancel_download_command(event):
+        try:
+            job_id = int(event.message.text.split(maxsplit=1)[1])
+        except (IndexError, ValueError):
+            await event.reply("Usage: `/cancel_download <id>` (see /queue for ids)")
+            return
+
+        job = download_scheduler.jobs.get(job_id)
+        is_admin = event.user_role == "admin"
+        if job is None or (job.user_id != event.sender_id and not is_admin):
+            await event.reply(f"❌ No download #{job_id} found.")
+            return
+
+        download_scheduler.cancel(job_id)
+        if job.status == "cancelled":
+            await event.reply(f"🛑 Removed {job.file_name} from the download queue.")
+
+    @router.command("disk", roles=ADMIN)
+    async def disk_command(event):
+        try:
+            await event.reply(await disk_space.report())
+        except Exception as e:
+            await handle_error(event, e, "Error reading disk usage")
+
+    @router.command("dedup_scan", roles=ADMIN)
+    async def dedup_scan_command(event):
+        hash_content = "hash" in event.message.text.split()[1:]
+        await event.reply("🔍 Indexing the media library, this may take a while...")
+        try:
+            indexed = await dedup_index.scan_library(hash_content)
+            await event.reply(f"✅ Indexed {indexed} files for duplicate detection.")
+        except Exception as e:
+            await handle_error(event, e, "Error indexing library")
+
+    @router.command("reorganize", roles=ADMIN)
+    async def reorganize_command(event):
+        apply = "apply" in event.message.text.split()[1:]
+        reorganizer = LibraryReorganizer()
+        loop = asyncio.get_running_loop()
+        await event.reply(
+            "🚚 Reorganizing the media library..."
+            if apply
+            else "🔍 Planning library reorganization (dry run)..."
+        )
+        try:
+            report = await loop.run_in_executor(
+                None, reorganizer.apply if apply else reorganizer.plan
+            )
+            text = report.format()
+            if not apply and report.moves:
+                text += "\n\nRun `/reorganize apply` to move these files."
+            await event.reply(text[:4000])
+        except Exception as e:
+            await handle_error(event, e, "Error reorganizing library")
+
+    @router.command("stats", roles=ADMIN)
+    async def stats_command(event):
+        text = metrics.summary()
+        if hasattr(plugins, "report"):
+            text += "\n\n🧩 Plugins:\n" + "\n".join(
+                f"• {line}" for line in plugins.report()
+            )
+        await event.reply(text)
+
+    @router.command("list_workbooks", roles=ADMIN)
     async def list_workbooks(event):
-        gsheets = plugins.get("google_sheets")
+        gsheets = await plugins.aget("google_sheets")
         if not gsheets:
             await event.reply("Google Sheets integration is not available.")
             return
@@ -86,27 +239,30 @@ def register_command_handlers(client, plugins):
                 )
                 return
 
-            buttons = await create_workbook_buttons(workbooks)
+            session = await session_store.get(event)
+            buttons = await create_workbook_buttons(workbooks, session)
+            await session_store.save(event, session)
             await event.reply("📑 Select a workbook:", buttons=buttons)
         except Exception as e:
             await handle_error(event, e, "Error listing workbooks")
 
-    @client.on(events.CallbackQuery(pattern=r"wb:(\d+)"))
-    @require_auth("admin")
+    @router.callback("wb", roles=ADMIN)
     async def handle_workbook_selection(event):
         try:
             wb_index = event.data.decode().split(":")[1]
-            workbook = WORKBOOK_CACHE.get(wb_index)
+            session = await session_store.get(event)
+            workbook = session.get("workbooks", {}).get(wb_index)
 
             if not workbook:
                 await event.edit("Session expired. Please run /list_workbooks again.")
                 return
 
-            gsheets = plugins.get("google_sheets")
+            gsheets = await plugins.aget("google_sheets")
             worksheets = await gsheets.list_worksheets(workbook["id"])
 
             if worksheets:
-                WORKBOOK_CACHE[wb_index]["worksheets"] = worksheets
+                workbook["worksheets"] = worksheets
+                await session_store.save(event, session)
                 buttons = await create_worksheet_buttons(wb_index, worksheets)
                 await event.edit(
                     f"📊 Workbook: **{workbook['name']}**\n\nSelect a worksheet:",
@@ -121,23 +277,24 @@ def register_command_handlers(client, plugins):
         except Exception as e:
             await handle_error(event, e, "Error in workbook selection")
 
-    @client.on(events.CallbackQuery(pattern=r"ws:(\d+):(\d+)"))
-    @require_auth("admin")
+    @router.callback("ws", roles=ADMIN)
     async def handle_worksheet_selection(event):
         try:
             _, wb_index, ws_index = event.data.decode().split(":")
-            workbook = WORKBOOK_CACHE.get(wb_index)
+            session = await session_store.get(event)
+            workbook = session.get("workbooks", {}).get(wb_index)
 
             if not workbook or "worksheets" not in workbook:
                 await event.edit("Session expired. Please run /list_workbooks again.")
                 return
 
             worksheet_name = workbook["worksheets"][int(ws_index)]
-            gsheets = plugins.get("google_sheets")
+            gsheets = await plugins.aget("google_sheets")
             headers = await gsheets.get_headers(workbook["id"], worksheet_name)
 
-            gsheets.current_workbook = workbook["id"]
-            gsheets.current_worksheet = worksheet_name
+            session["current_workbook"] = workbook["id"]
+            session["current_worksheet"] = worksheet_name
+            await session_store.save(event, session)
 
             buttons = [
                 [Button.inline("🔙 Back to Worksheets", data=f"wb:{wb_index}")],
@@ -156,20 +313,21 @@ def register_command_handlers(client, plugins):
         except Exception as e:
             await handle_error(event, e, "Error in worksheet selection")
 
-    @client.on(events.CallbackQuery(pattern=r"back_wb"))
-    @require_auth("admin")
+    @router.callback("back_wb", roles=ADMIN)
     async def handle_back_to_workbooks(event):
         await list_workbooks(event)
 
-    @client.on(events.NewMessage(pattern="/add_row"))
-    @require_auth("admin")
+    @router.command("add_row", roles=ADMIN)
     async def add_row(event):
-        gsheets = plugins.get("google_sheets")
+        gsheets = await plugins.aget("google_sheets")
         if not gsheets:
             await event.reply("Google Sheets integration is not available.")
             return
 
-        if not gsheets.current_workbook or not gsheets.current_worksheet:
+        session = await session_store.get(event)
+        current_workbook = session.get("current_workbook")
+        current_worksheet = session.get("current_worksheet")
+        if not current_workbook or not current_worksheet:
             await event.reply(
                 "No worksheet selected. Please select a worksheet first using /list_workbooks"
             )
@@ -178,11 +336,9 @@ def register_command_handlers(client, plugins):
         try:
             message_text = event.message.text.split(maxsplit=1)[1]
             values = [v.strip() for v in message_text.split(",")]
-            await gsheets.add_row(
-                gsheets.current_workbook, gsheets.current_worksheet, values
-            )
+            await gsheets.add_row(current_workbook, current_worksheet, values)
             await event.reply(
-                f"✅ Row added successfully to worksheet: {gsheets.current_worksheet}"
+                f"✅ Row added successfully to worksheet: {current_worksheet}"
             )
         except IndexError:
             await event.reply(
@@ -192,100 +348,66 @@ def register_command_handlers(client, plugins):
         except Exception as e:
             await handle_error(event, e, "Error adding row")
 
-    @client.on(events.NewMessage(pattern="/record_payment"))
-    @require_auth("admin")
+    @router.command("record_payment", roles=ADMIN)
     async def record_payment(event):
-        gsheets = plugins.get("google_sheets")
+        gsheets = await plugins.aget("google_sheets")
         if not gsheets:
             await event.reply("Google Sheets integration is not available.")
             return
 
-        config = PAYMENT_CONFIGS["sales_tracking"]
         try:
-            range_name = f"{config['product_data']['worksheet_name']}!{config['product_data']['range']}"
-            rows = await gsheets.get_values(config["workbook_id"], range_name)
+            parts = event.message.text.split(maxsplit=1)
+            prefix = parts[1].strip() if len(parts) > 1 else ""
+            catalog = await product_catalogs.get("sales_tracking")
 
-            if not rows:
+            if not catalog.products:
                 await event.reply("❌ No products found in the product sheet.")
                 return
 
-            buttons = []
-            active_count = 0
-            for row in rows:  # Remove the [:10] limit since we'll filter active ones
-                if (
-                    len(row) >= 15 and row[15].upper() == "TRUE"
-                ):  # Check if product is active
-                    if active_count >= 10:  # Only show first 10 active products
-                        break
-
-                    product_id = row[config["product_data"]["columns"]["product_id"]]
-                    customer_name = row[
-                        config["product_data"]["columns"]["customer_name"]
-                    ]
-                    weekly_installment = row[
-                        config["product_data"]["columns"]["weekly_installment"]
-                    ]
-
-                    button_text = (
-                        f"📦 {product_id} | {customer_name}\n"
-                        f"💰 Weekly: {weekly_installment}"
-                    )
-                    buttons.append(
-                        [Button.inline(button_text, data=f"payment_prod:{product_id}")]
-                    )
-                    active_count += 1
-
+            text, buttons = build_payment_page(catalog, 0, prefix)
             if not buttons:
                 await event.reply("❌ No active products found.")
                 return
 
-            if (
-                len(
-                    [
-                        row
-                        for row in rows
-                        if len(row) >= 15 and row[14].upper() == "TRUE"
-                    ]
-                )
-                > 10
-            ):
-                buttons.append([Button.inline("Next ➡️", data="payment_next:10")])
+            await event.reply(text, buttons=buttons)
+        except Exception as e:
+            await handle_error(event, e, "Error fetching products")
 
-            await event.reply(
-                "🧾 Record Payment\n\n" "Select a product from the list below:",
-                buttons=buttons,
-            )
+    @router.callback("payment_page", roles=ADMIN)
+    async def handle_payment_page(event):
+        try:
+            _, offset, prefix = event.data.decode().split(":", 2)
+            catalog = await product_catalogs.get("sales_tracking")
+            text, buttons = build_payment_page(catalog, int(offset), prefix)
+            if not buttons:
+                await event.edit("❌ No active products found.")
+                return
+
+            await event.edit(text, buttons=buttons)
         except Exception as e:
             await handle_error(event, e, "Error fetching products")
 
-    @client.on(events.CallbackQuery(pattern=r"payment_prod:(.+)"))
-    @require_auth("admin")
+    @router.callback("payment_prod", roles=ADMIN)
     async def handle_payment_product_selection(event):
         try:
             product_id = event.data.decode().split(":")[1]
 
             # Get product details
             config = PAYMENT_CONFIGS["sales_tracking"]
-            gsheets = plugins.get("google_sheets")
-            range_name = f"{config['product_data']['worksheet_name']}!{config['product_data']['range']}"
-            rows = await gsheets.get_values(config["workbook_id"], range_name)
-
-            product_details = None
-            for row in rows:
-                if row[config["product_data"]["columns"]["product_id"]] == product_id:
-                    product_details = row
-                    break
+            columns = config["product_data"]["columns"]
+            catalog = await product_catalogs.get("sales_tracking")
+            product_details = catalog.get_product(product_id)
 
             if product_details:
-                customer_name = product_details[
-                    config["product_data"]["columns"]["customer_name"]
-                ]
-                weekly_installment = product_details[
-                    config["product_data"]["columns"]["weekly_installment"]
-                ]
+                customer_name = get_cell(product_details, columns["customer_name"])
+                weekly_installment = get_cell(
+                    product_details, columns["weekly_installment"]
+                )
 
-                WORKBOOK_CACHE["temp_product"] = product_id
-                WORKBOOK_CACHE["expecting_amount"] = True
+                session = await session_store.get(event)
+                session["temp_product"] = product_id
+                session["expecting_amount"] = True
+                await session_store.save(event, session)
 
                 # Send a new message instead of editing
                 await event.respond(
@@ -304,15 +426,67 @@ def register_command_handlers(client, plugins):
         except Exception as e:
             await handle_error(event, e, "Error in payment selection")
 
-    @client.on(events.NewMessage())
-    @require_auth("admin")
-    async def handle_payment_amount(event):
-        if not WORKBOOK_CACHE.get("expecting_amount"):
+    @router.command("refresh_products", roles=ADMIN)
+    async def refresh_products(event):
+        if not await plugins.aget("google_sheets"):
+            await event.reply("Google Sheets integration is not available.")
+            return
+
+        try:
+            product_catalogs.invalidate()
+            catalog = await product_catalogs.get("sales_tracking")
+            await event.reply(
+                f"✅ Product catalog reloaded: {len(catalog.products)} products "
+                f"({len(catalog.active_products)} active)"
+            )
+        except Exception as e:
+            await handle_error(event, e, "Error refreshing products")
+
+    @router.command("bulk_invoice", roles=ADMIN)
+    async def bulk_invoice(event):
+        zoho = await plugins.aget("zoho_invoicing")
+        if zoho:
+            await zoho.load_tokens()
+        if not zoho or not zoho.tokens_available():
+            await event.reply("Zoho Books integration is not available.")
+            return
+        if not await plugins.aget("google_sheets"):
+            await event.reply("Google Sheets integration is not available.")
+            return
+
+        parts = event.message.text.split(maxsplit=1)
+        period = (
+            parts[1].strip() if len(parts) > 1 else datetime.now().strftime("%Y-%m")
+        )
+        try:
+            datetime.strptime(period, "%Y-%m")
+        except ValueError:
+            await event.reply("Usage: `/bulk_invoice [YYYY-MM]`")
             return
 
+        try:
+            catalog = await product_catalogs.get("sales_tracking")
+            await event.reply(
+                f"🧾 Invoicing {len(catalog.active_products)} active products "
+                f"for {period}..."
+            )
+            summary = await BulkInvoicer(zoho, catalog, period).run()
+            await event.reply(summary.format())
+        except Exception as e:
+            await handle_error(event, e, "Error creating invoices")
+
+    async def expecting_amount(event):
+        if event.document:
+            return False
+        session = await session_store.get(event)
+        return session.get("expecting_amount", False)
+
+    @router.conversation(expecting_amount, roles=ADMIN)
+    async def handle_payment_amount(event):
+        session = await session_store.get(event)
+
         if event.message.text.lower() in ["/cancel", "cancel", "abort", "/abort"]:
-            WORKBOOK_CACHE.pop("temp_product", None)
-            WORKBOOK_CACHE.pop("expecting_amount", None)
+            await end_payment_flow(event, session)
             await event.reply(
                 "❌ Payment recording cancelled. Use /record_payment to start over."
             )
@@ -320,15 +494,15 @@ def register_command_handlers(client, plugins):
 
         try:
             amount = float(event.message.text)
-            product_id = WORKBOOK_CACHE.get("temp_product")
+            product_id = session.get("temp_product")
 
             if not product_id:
                 await event.reply("❌ Please start over with /record_payment")
-                WORKBOOK_CACHE.pop("expecting_amount", None)
+                await end_payment_flow(event, session)
                 return
 
             config = PAYMENT_CONFIGS["sales_tracking"]
-            gsheets = plugins.get("google_sheets")
+            gsheets = await plugins.aget("google_sheets")
             today = datetime.now().strftime("%Y-%m-%d")
             days_late = await gsheets.calculate_days_late(product_id)
 
@@ -348,8 +522,7 @@ def register_command_handlers(client, plugins):
                 config["workbook_id"], config["worksheet_name"], row_data
             )
 
-            WORKBOOK_CACHE.pop("temp_product", None)
-            WORKBOOK_CACHE.pop("expecting_amount", None)
+            await end_payment_flow(event, session)
 
             await event.reply(
                 "✅ Payment recorded successfully!\n\n"
@@ -365,6 +538,5 @@ def register_command_handlers(client, plugins):
                 "Type 'cancel' to abort the operation, or try again with a valid number."
             )
         except Exception as e:
-            WORKBOOK_CACHE.pop("temp_product", None)
-            WORKBOOK_CACHE.pop("expecting_amount", None)
+            await end_payment_flow(event, session)
             await handle_error(event, e, "Error recording payment")
@@ -1,14 +1,61 @@
-from telethon import events, Button
-from modules.file_downloader import handle_file_download
+from modules.disk_space import InsufficientSpaceError, disk_space
+from modules.file_downloader import (
+    album_collector,
+    download_scheduler,
+    get_file_name,
+)
 from utils.bot_commands import get_commands_description
 import logging
-from handlers.command_handlers import WORKBOOK_CACHE
 
 logger = logging.getLogger(__name__)
 
 
-def register_message_handlers(client, plugins):
-    @client.on(events.NewMessage)
+async def reply_queued(event, job):
+    if job.status == "queued":
+        position = download_scheduler.queued_jobs().index(job) + 1
+        await event.reply(
+            f"📥 {job.file_name} queued as download #{job.id} "
+            f"(position {position}). Use /queue to check progress."
+        )
+
+
+def already_downloading(event):
+    """Reply text if the document is already queued or downloading, else None"""
+    job = download_scheduler.active_job(event.document)
+    if job is None:
+        return None
+    return (
+        f"⏳ {get_file_name(event.document)} is already being downloaded "
+        f"as part of #{job.id}."
+    )
+
+
+async def submit_album(events):
+    first = events[0]
+    try:
+        size = sum(event.document.size for event in events)
+        try:
+            await disk_space.check(size)
+        except InsufficientSpaceError as e:
+            await first.reply(f"💾 Can't download this album. {str(e)}.")
+            return
+
+        # No await between this check and submitting, so it cannot go stale
+        busy = [text for text in map(already_downloading, events) if text]
+        events = [event for event in events if not already_downloading(event)]
+        if events:
+            job = download_scheduler.submit_album(events, first.client)
+        if busy:
+            await first.reply("\n".join(busy))
+        if events:
+            await reply_queued(first, job)
+    except Exception as e:
+        logger.error(f"Error queueing album: {str(e)}")
+        await first.reply("Sorry, there was an error queueing the album.")
+
+
+def register_message_handlers(router, plugins):
+    @router.default
     async def message_handler(event):
         # Ignore messages from bots or channels
         if event.sender is None or event.sender.bot or event.is_channel:
@@ -29,23 +76,41 @@ def register_message_handlers(client, plugins):
             logger.info(f"Ignoring message with keyword: {event.message.text[:50]}...")
             return
 
-        # Check if we're expecting a payment amount
-        if hasattr(client, "expecting_payment") and client.expecting_payment():
+        if event.document:
+            if event.message.grouped_id:
+                # Album documents are scheduled together once all have arrived
+                album_collector.add(event, submit_album)
+                return
+
+            # Refuse files that cannot fit before they wait in the queue
+            try:
+                await disk_space.check(event.document.size)
+            except InsufficientSpaceError as e:
+                await event.reply(
+                    f"💾 Can't download {get_file_name(event.document)}. {str(e)}."
+                )
+                return
+
+            busy = already_downloading(event)
+            if busy:
+                await event.reply(busy)
+                return
+
+            await reply_queued(event, download_scheduler.submit(event, event.client))
             return
 
-        # Only show welcome message for non-command, non-file, non-reply messages
-        # AND when we're not expecting a payment amount
+        # Only show welcome message for non-command, non-file, non-reply messages.
+        # Messages that belong to an ongoing conversation never reach this handler.
         if (
             not event.document
             and not event.message.text.startswith("/")
             and not event.message.is_reply
-            and not WORKBOOK_CACHE.get("expecting_amount", False)  # Add this condition
         ):
             await event.reply(
                 "Welcome to SAI Technology's Robotics Process Automation (RPA) service!  type /help to see what i am capable of"
             )
 
-    @client.on(events.CallbackQuery(pattern=r"list_commands"))
+    @router.callback("list_commands")
     async def list_commands_callback(event):
         await event.answer()
         await event.edit(
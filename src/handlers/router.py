@@ -0,0 +1,118 @@
+import inspect
+import logging
+from time import perf_counter
+
+from telethon import events
+
+from modules.metrics import metrics
+from utils.auth import resolve_role
+
+logger = logging.getLogger(__name__)
+
+
+class Router:
+    """Dispatches every update to exactly one handler.
+
+    A single NewMessage and a single CallbackQuery handler are registered with
+    Telethon. Commands are looked up by name and callbacks by the data prefix
+    before the first ``:``, both in plain dicts built at registration time.
+    The sender's role is resolved once per update and stored on the event as
+    ``event.user_role``.
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.callbacks = {}
+        self.conversations = []
+        self.default_handler = None
+
+    def command(self, name, roles=None):
+        def decorator(func):
+            self.commands[name] = (func, roles)
+            return func
+
+        return decorator
+
+    def callback(self, prefix, roles=None):
+        def decorator(func):
+            self.callbacks[prefix] = (func, roles)
+            return func
+
+        return decorator
+
+    def conversation(self, predicate, roles=None):
+        """Route non-command messages to func while predicate(event) is true.
+
+        The predicate may be a plain function or a coroutine function.
+        """
+
+        def decorator(func):
+            self.conversations.append((predicate, func, roles))
+            return func
+
+        return decorator
+
+    def default(self, func):
+        self.default_handler = func
+        return func
+
+    def attach(self, client):
+        client.add_event_handler(self.dispatch_message, events.NewMessage())
+        client.add_event_handler(self.dispatch_callback, events.CallbackQuery())
+        logger.info(
+            f"Router attached with {len(self.commands)} commands and "
+            f"{len(self.callbacks)} callbacks"
+        )
+
+    async def _run(self, func, event):
+        started = perf_counter()
+        try:
+            await func(event)
+        except Exception:
+            metrics.handler_errors.inc(func.__name__)
+            raise
+        finally:
+            metrics.handler_latency.observe(perf_counter() - started, func.__name__)
+
+    async def _call(self, route, event):
+        func, roles = route
+        if roles is not None and event.user_role not in roles:
+            await event.reply("You are not authorized to use this command.")
+            return
+        await self._run(func, event)
+
+    async def dispatch_message(self, event):
+        event.user_role = resolve_role(event.sender_id)
+        text = event.raw_text or ""
+
+        if text.startswith("/"):
+            # "/cmd@BotName args" -> "cmd"; "/" or "/ " alone name no command
+            words = text[1:].split(maxsplit=1)
+            name = words[0].split("@", 1)[0] if words else ""
+            route = self.commands.get(name.lower())
+            if route:
+                await self._call(route, event)
+                return
+
+        for predicate, func, roles in self.conversations:
+            if roles is not None and event.user_role not in roles:
+                continue
+            matched = predicate(event)
+            if inspect.isawaitable(matched):
+                matched = await matched
+            if matched:
+                await self._run(func, event)
+                return
+
+        if self.default_handler:
+            await self._run(self.default_handler, event)
+
+    async def dispatch_callback(self, event):
+        event.user_role = resolve_role(event.sender_id)
+        prefix = event.data.split(b":", 1)[0].decode(errors="ignore")
+        route = self.callbacks.get(prefix)
+        if route:
+            await self._call(route, event)
+        else:
+            logger.warning(f"No handler for callback data: {event.data[:64]!r}")
+            await event.answer()
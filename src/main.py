@@ -1,10 +1,12 @@
 import asyncio
 import logging
+from time import perf_counter
 from telethon import TelegramClient
-from telethon.errors import FloodWaitError
-from config import API_ID, API_HASH, BOT_TOKEN, USER_ROLES
+from config import API_ID, API_HASH, BOT_MODE
 from handlers import register_handlers
+from modules.metrics import metrics
 from plugins import load_plugins
+from utils.lifecycle import start_client, shutdown
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -14,33 +16,29 @@ logger = logging.getLogger(__name__)
 
 async def main():
     client = TelegramClient("bot", API_ID, API_HASH)
+    plugins = {}
 
     try:
+        started = perf_counter()
         plugins = load_plugins()
         register_handlers(client, plugins)
-
-        while True:
-            try:
-                await client.start(bot_token=BOT_TOKEN)
-                logger.info("Bot started successfully")
-                break  # Exit the loop if successful
-            except FloodWaitError as e:
-                wait_time = e.seconds
-                logger.warning(
-                    f"Rate limited. Waiting {wait_time} seconds before retrying..."
-                )
-                await asyncio.sleep(wait_time)
-            except Exception as e:
-                logger.error(f"Failed to start bot: {str(e)}")
-                raise
-
+        await start_client(client)
+        # Import plugins and build their clients off the loop before first use
+        plugins.warm()
+        logger.info(f"Bot ready in {(perf_counter() - started) * 1000:.0f} ms")
+        await metrics.start()
         await client.run_until_disconnected()
     except Exception as e:
         logger.error(f"Error in main function: {str(e)}")
     finally:
-        await client.disconnect()
+        await shutdown(client, plugins)
         logger.info("Bot stopped")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if BOT_MODE == "scaleout":
+        from worker_pool import run_scaleout
+
+        run_scaleout()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,339 @@
+import asyncio
+import calendar
+import json
+import logging
+import os
+import re
+from time import monotonic
+
+from config import (
+    STATE_DIR,
+    ZOHO_BULK_CONCURRENCY,
+    ZOHO_BULK_MAX_CONCURRENCY,
+    ZOHO_BULK_MAX_RETRIES,
+)
+from modules.product_catalog import get_cell
+from modules.zoho_invoicing import ZohoApiError
+from utils.helpers import format_duration, percentile
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.path.join(STATE_DIR, "invoices")
+MAX_BACKOFF = 60
+
+# Periods with a run in progress, so two commands cannot race on one checkpoint
+_running_periods = set()
+
+
+def parse_amount(value):
+    """Turn a sheet cell like 'GHS 1,250.00' into a float"""
+    cleaned = re.sub(r"[^\d.]", "", str(value))
+    return float(cleaned) if cleaned else None
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to Zoho's rate limiting (AIMD).
+
+    Every success raises the limit by 1/limit, so it grows by about one slot
+    per round of requests. A 429 halves it and pauses new requests for the
+    Retry-After period.
+    """
+
+    def __init__(self, initial, maximum):
+        self.limit = float(max(initial, 1))
+        self.maximum = max(maximum, 1)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        delay = self.paused_until - monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self, throttled=False, retry_after=0):
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+                self.paused_until = max(self.paused_until, monotonic() + retry_after)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class BulkInvoiceSummary:
+    def __init__(self, period, total):
+        self.period = period
+        self.total = total
+        self.created = 0
+        self.skipped = 0
+        self.failed = {}
+        self.throttled = 0
+        self.latencies = []
+        self.elapsed = 0.0
+
+    def format(self):
+        rate = self.created / self.elapsed if self.elapsed else 0.0
+        lines = [
+            f"🧾 Bulk invoicing for {self.period}",
+            f"✅ Created: {self.created}",
+            f"⏭️ Already invoiced: {self.skipped}",
+            f"❌ Failed: {len(self.failed)}",
+            f"⏱️ {format_duration(self.elapsed)} ({rate:.2f} invoices/s)",
+        ]
+        if self.latencies:
+            lines.append(
+                f"📈 Latency p50 {percentile(self.latencies, 50):.2f}s, "
+                f"p95 {percentile(self.latencies, 95):.2f}s"
+            )
+        if self.throttled:
+            lines.append(f"🐢 Rate limited {self.throttled} times")
+        for product_id, error in list(self.failed.items())[:10]:
+            lines.append(f"• {product_id}: {error}")
+        if len(self.failed) > 10:
+            lines.append(f"… and {len(self.failed) - 10} more")
+        return "\n".join(lines)
+
+
+class BulkInvoicer:
+    """Create one Zoho invoice per active product for a billing period.
+
+    Progress is checkpointed to STATE_DIR/invoices/<period>.json: status
+    changes are appended to <period>.journal as they happen and folded into
+    the checkpoint when the run ends. Each invoice
+    carries the reference number "<period>-<product_id>", so after a crash
+    the run resumes where it stopped: created invoices are skipped, and ones
+    whose submission outcome is unknown are looked up in Zoho before being
+    sent again.
+    """
+
+    def __init__(
+        self,
+        zoho,
+        catalog,
+        period,
+        concurrency=ZOHO_BULK_CONCURRENCY,
+        max_concurrency=ZOHO_BULK_MAX_CONCURRENCY,
+        max_retries=ZOHO_BULK_MAX_RETRIES,
+    ):
+        self.zoho = zoho
+        self.catalog = catalog
+        self.period = period
+        self.columns = catalog.columns
+        self.limiter = AdaptiveLimiter(concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.checkpoint_path = os.path.join(CHECKPOINT_DIR, f"{period}.json")
+        self.journal_path = os.path.join(CHECKPOINT_DIR, f"{period}.journal")
+        self._journal_pending = []
+        self.state = {}
+        self.summary = None
+        self._save_lock = asyncio.Lock()
+        self._customers = {}
+
+        year, month = (int(part) for part in period.split("-"))
+        last_day = calendar.monthrange(year, month)[1]
+        self.invoice_date = f"{period}-{last_day:02d}"
+
+    def reference_number(self, product_id):
+        return f"{self.period}-{product_id}"
+
+    def _read_checkpoint(self):
+        """The compacted checkpoint with the journal of later changes replayed"""
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        try:
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # A write cut short by a crash
+                    state[entry.pop("product_id")] = entry
+        except FileNotFoundError:
+            pass
+        return state
+
+    def _append_journal(self, lines):
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        with open(self.journal_path, "a") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_checkpoint(self, snapshot):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        # Everything in the journal is now in the checkpoint
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+    async def _mark(self, product_id, status, **details):
+        """Record a status change durably before returning.
+
+        Each change is one journal line. Changes made while a write is in
+        flight are written together after it, sharing one fsync.
+        """
+        self.state[product_id] = {"status": status, **details}
+        self._journal_pending.append(
+            json.dumps({"product_id": product_id, "status": status, **details})
+        )
+        async with self._save_lock:
+            if not self._journal_pending:
+                return  # Written by the previous holder of the lock
+            lines, self._journal_pending = self._journal_pending, []
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._append_journal, lines)
+
+    async def _compact(self):
+        async with self._save_lock:
+            snapshot = json.dumps(self.state, indent=2)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_checkpoint, snapshot)
+
+    async def _call(self, func, *args):
+        """Run one Zoho call under the limiter, retrying 429s with backoff"""
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            started = monotonic()
+            try:
+                result = await func(*args)
+            except ZohoApiError as e:
+                if e.status != 429 or attempt == self.max_retries:
+                    await self.limiter.release()
+                    raise
+                try:
+                    retry_after = float(e.retry_after)
+                except (TypeError, ValueError):
+                    retry_after = min(2**attempt, MAX_BACKOFF)
+                self.summary.throttled += 1
+                await self.limiter.release(throttled=True, retry_after=retry_after)
+                logger.info(
+                    f"Zoho rate limit hit, limit now {int(self.limiter.limit)}, "
+                    f"retrying in {retry_after:.0f}s"
+                )
+                continue
+            except BaseException:
+                await self.limiter.release()
+                raise
+            self.summary.latencies.append(monotonic() - started)
+            await self.limiter.release()
+            return result
+
+    async def _customer_id(self, name):
+        key = name.strip().lower()
+        if key not in self._customers:
+            matches = await self.zoho.get_customers(contact_name=name.strip()) or []
+            self._customers[key] = matches[0]["contact_id"] if matches else None
+        return self._customers[key]
+
+    def build_invoice(self, product_id, row, customer_id):
+        rate = parse_amount(get_cell(row, self.columns["weekly_installment"]))
+        if rate is None:
+            return None
+        return {
+            "customer_id": customer_id,
+            "reference_number": self.reference_number(product_id),
+            "date": self.invoice_date,
+            "line_items": [
+                {
+                    "name": f"Installment {product_id}",
+                    "description": f"{self.period} installment for product {product_id}",
+                    "rate": rate,
+                    "quantity": 1,
+                }
+            ],
+        }
+
+    async def _fail(self, product_id, error, status="failed"):
+        self.summary.failed[product_id] = error
+        await self._mark(product_id, status, error=error)
+
+    async def _invoice_product(self, row):
+        product_id = get_cell(row, self.columns["product_id"])
+        entry = self.state.get(product_id, {})
+        if entry.get("status") == "created":
+            self.summary.skipped += 1
+            return
+
+        reference = self.reference_number(product_id)
+        try:
+            if entry.get("status") == "submitting":
+                existing = await self._call(self.zoho.find_invoice, reference)
+                if existing:
+                    self.summary.skipped += 1
+                    await self._mark(
+                        product_id, "created", invoice_id=existing.get("invoice_id")
+                    )
+                    return
+
+            customer_name = get_cell(row, self.columns["customer_name"])
+            customer_id = await self._customer_id(customer_name)
+            if not customer_id:
+                await self._fail(product_id, f"No Zoho contact named '{customer_name}'")
+                return
+
+            invoice = self.build_invoice(product_id, row, customer_id)
+            if invoice is None:
+                await self._fail(product_id, "Missing weekly installment")
+                return
+        except Exception as e:
+            self.summary.failed[product_id] = str(e)
+            return
+
+        await self._mark(product_id, "submitting")
+        try:
+            created = await self._call(self.zoho.submit_invoice, invoice)
+        except ZohoApiError as e:
+            # A 4xx means Zoho rejected it; anything else leaves the outcome unknown
+            status = "failed" if 400 <= e.status < 500 else "submitting"
+            await self._fail(product_id, str(e), status)
+            return
+        except Exception as e:
+            self.summary.failed[product_id] = str(e)
+            return
+
+        self.summary.created += 1
+        await self._mark(product_id, "created", invoice_id=created.get("invoice_id"))
+
+    async def run(self):
+        if self.period in _running_periods:
+            raise RuntimeError(f"Bulk invoicing for {self.period} is already running")
+        _running_periods.add(self.period)
+        try:
+            loop = asyncio.get_running_loop()
+            self.state = await loop.run_in_executor(None, self._read_checkpoint)
+            rows = list(self.catalog.active_products)
+            self.summary = BulkInvoiceSummary(self.period, len(rows))
+            logger.info(
+                f"Bulk invoicing {len(rows)} products for {self.period} "
+                f"({len(self.state)} in checkpoint)"
+            )
+
+            started = monotonic()
+            try:
+                await asyncio.gather(*(self._invoice_product(row) for row in rows))
+            finally:
+                await self._compact()
+            self.summary.elapsed = monotonic() - started
+            logger.info(
+                f"Bulk invoicing for {self.period} finished: "
+                f"{self.summary.created} created, {self.summary.skipped} skipped, "
+                f"{len(self.summary.failed)} failed in {self.summary.elapsed:.1f}s"
+            )
+            return self.summary
+        finally:
+            _running_periods.discard(self.period)
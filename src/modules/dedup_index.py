@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from time import time
+
+from config import DEDUP_DB_PATH, DOWNLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    document_id INTEGER,
+    access_hash INTEGER,
+    file_name TEXT,
+    content_hash TEXT,
+    mime_type TEXT,
+    media_info TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_document ON media (document_id, size);
+CREATE INDEX IF NOT EXISTS media_content_hash ON media (content_hash);
+"""
+
+# Columns added after the first release of the index
+MIGRATIONS = {"mime_type": "TEXT", "media_info": "TEXT"}
+
+# Files inside DOWNLOAD_DIR that are bookkeeping rather than media
+IGNORED_SUFFIXES = (".parts", ".partial")
+
+
+def hash_file(path, chunk_size=4 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupIndex:
+    """SQLite index of media already present under DOWNLOAD_DIR.
+
+    Entries are keyed by library path (relative to DOWNLOAD_DIR) and carry
+    the Telegram document id/access hash when the file came from the bot, so
+    a re-forwarded document can be recognised before any bytes move. All
+    database work runs in the default executor.
+    """
+
+    def __init__(self, db_path=DEDUP_DB_PATH, library_dir=DOWNLOAD_DIR):
+        self.db_path = db_path
+        self.library_dir = library_dir
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(media)")}
+            for column, column_type in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(
+                        f"ALTER TABLE media ADD COLUMN {column} {column_type}"
+                    )
+        return self._conn
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _is_present(self, path, size):
+        try:
+            return os.path.getsize(os.path.join(self.library_dir, path)) == size
+        except OSError:
+            return False
+
+    def _first_present(self, conn, paths, size):
+        for existing_path in paths:
+            if self._is_present(existing_path, size):
+                return existing_path
+            # The file was removed from the library, forget it
+            conn.execute("DELETE FROM media WHERE path = ?", (existing_path,))
+        return None
+
+    def _find(self, document_id, size, path):
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT path FROM media WHERE document_id = ? AND size = ? "
+                "UNION ALL SELECT path FROM media WHERE path = ? AND size = ?",
+                (document_id, size, path, size),
+            ).fetchall()
+            existing_path = self._first_present(conn, [row[0] for row in rows], size)
+            conn.commit()
+        return existing_path
+
+    def _find_content(self, size, content_hash):
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT path FROM media WHERE content_hash = ? AND size = ?",
+                (content_hash, size),
+            ).fetchall()
+            existing_path = self._first_present(conn, [row[0] for row in rows], size)
+            conn.commit()
+        return existing_path
+
+    def _record(self, path, size, document_id, access_hash, file_name, details):
+        media_info = details.get("media_info")
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO media (path, size, document_id, access_hash, "
+                "file_name, content_hash, mime_type, media_info, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    size,
+                    document_id,
+                    access_hash,
+                    file_name,
+                    details.get("sha256"),
+                    details.get("mime_type"),
+                    json.dumps(media_info) if media_info else None,
+                    time(),
+                ),
+            )
+            conn.commit()
+
+    def _scan(self, hash_content):
+        indexed = 0
+        batch = []
+        for root, dirs, files in os.walk(self.library_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.startswith(".") or name.endswith(IGNORED_SUFFIXES):
+                    continue
+                full_path = os.path.join(root, name)
+                try:
+                    size = os.path.getsize(full_path)
+                    content_hash = hash_file(full_path) if hash_content else None
+                except OSError as e:
+                    logger.warning(f"Skipping {full_path}: {str(e)}")
+                    continue
+                path = os.path.relpath(full_path, self.library_dir)
+                batch.append((path, size, name, content_hash, time()))
+                if len(batch) >= 500:
+                    indexed += self._insert_scanned(batch)
+                    batch = []
+        if batch:
+            indexed += self._insert_scanned(batch)
+        return indexed
+
+    def _insert_scanned(self, batch):
+        with self._lock:
+            conn = self._connection()
+            # Keep document ids from earlier downloads, only fill in unknown files
+            conn.executemany(
+                "INSERT OR IGNORE INTO media (path, size, file_name, content_hash, "
+                "indexed_at) VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+            conn.commit()
+        return len(batch)
+
+    def file_names(self, paths):
+        """Map library paths to the name the bot originally received them as.
+
+        Files only known from a library scan are left out, since their stored
+        name is just the current one. Blocking; call from a worker thread.
+        """
+        names = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(paths), 500):
+                chunk = paths[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                names.update(
+                    conn.execute(
+                        f"SELECT path, file_name FROM media "
+                        f"WHERE path IN ({placeholders}) AND document_id IS NOT NULL",
+                        chunk,
+                    ).fetchall()
+                )
+        return names
+
+    def rename_paths(self, moves):
+        """Point entries at new library paths after files were moved (blocking)"""
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "UPDATE OR REPLACE media SET path = ? WHERE path = ?",
+                [(new, old) for old, new in moves],
+            )
+            conn.commit()
+
+    async def find_duplicate(self, document, path):
+        """Return the library path of an existing copy of a document, if any"""
+        return await self._run(self._find, document.id, document.size, path)
+
+    async def find_same_content(self, size, content_hash):
+        """Return the library path of a file with the same size and SHA-256.
+
+        Catches copies that were renamed, moved or sent as another document;
+        needs DEDUP_HASH_CONTENT so both sides have a checksum.
+        """
+        return await self._run(self._find_content, size, content_hash)
+
+    async def record(self, document, path, file_name, details=None):
+        """Record a downloaded document along with its post-processing results"""
+        await self._run(
+            self._record,
+            path,
+            document.size,
+            document.id,
+            document.access_hash,
+            file_name,
+            details or {},
+        )
+
+    async def scan_library(self, hash_content=False):
+        """Index every media file already under DOWNLOAD_DIR"""
+        indexed = await self._run(self._scan, hash_content)
+        logger.info(f"Indexed {indexed} files under {self.library_dir}")
+        return indexed
+
+
+dedup_index = DedupIndex()
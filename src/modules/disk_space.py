@@ -0,0 +1,242 @@
+import asyncio
+import ctypes
+import errno
+import logging
+import os
+import sqlite3
+import threading
+from time import time
+
+from config import DISK_LEDGER_DB_PATH, DISK_RESERVE_HEADROOM, DOWNLOAD_DIR
+from utils.helpers import format_duration, format_size
+
+logger = logging.getLogger(__name__)
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _fallocate = getattr(_libc, "fallocate64", None) or _libc.fallocate
+    _fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+except (OSError, AttributeError):
+    _fallocate = None
+
+
+def preallocate(fd, size):
+    """Reserve size bytes of real disk blocks for fd, falling back to a sparse file.
+
+    Uses fallocate(2) directly instead of os.posix_fallocate, because glibc
+    emulates the latter on filesystems without support (NFS, some NAS
+    shares) by writing to every block, which is far too slow for large files.
+    Returns True if the blocks were allocated.
+    """
+    if _fallocate is not None and size > 0:
+        if _fallocate(fd, 0, 0, size) == 0:
+            if os.fstat(fd).st_size > size:
+                os.ftruncate(fd, size)
+            return True
+        error = ctypes.get_errno()
+        if error not in (errno.EOPNOTSUPP, errno.ENOSYS):
+            raise OSError(error, os.strerror(error))
+    os.ftruncate(fd, size)
+    return False
+
+
+class InsufficientSpaceError(Exception):
+    def __init__(self, needed, available):
+        super().__init__(
+            f"Not enough disk space: {format_size(needed)} needed, "
+            f"{format_size(max(available, 0))} available"
+        )
+        self.needed = needed
+        self.available = available
+
+
+class Reservation:
+    def __init__(self, reservation_id, path, size, owner, pid=None, created_at=None):
+        self.id = reservation_id
+        self.path = path
+        self.size = size
+        self.owner = owner
+        self.pid = os.getpid() if pid is None else pid
+        self.created_at = time() if created_at is None else created_at
+
+    def outstanding(self):
+        """Bytes still to be taken from the disk, i.e. not yet allocated to the file"""
+        try:
+            allocated = os.stat(self.path).st_blocks * 512
+        except FileNotFoundError:
+            allocated = 0
+        return max(self.size - allocated, 0)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class DiskSpaceLedger:
+    """Admission control for downloads against free space on DOWNLOAD_DIR.
+
+    Each running download holds a reservation for its announced size. Space
+    it has not allocated yet is subtracted from statvfs free space (less
+    DISK_RESERVE_HEADROOM) before another download is admitted, so parallel
+    downloads cannot together overfill the disk.
+
+    Reservations live in a SQLite file under STATE_DIR, so every process
+    sharing it (the scale-out workers) sees the others' downloads, and a
+    reservation is checked and recorded in one write transaction. Rows left
+    by a process that died are dropped the next time the ledger is read.
+    """
+
+    def __init__(
+        self,
+        root=DOWNLOAD_DIR,
+        headroom=DISK_RESERVE_HEADROOM,
+        db_path=DISK_LEDGER_DB_PATH,
+    ):
+        self.root = root
+        self.headroom = headroom
+        self.db_path = db_path
+        self._held = set()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.db_path, timeout=10, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reservations ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, "
+                "size INTEGER NOT NULL, owner TEXT NOT NULL, pid INTEGER NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _reservations(self, conn):
+        reservations = [
+            Reservation(*row)
+            for row in conn.execute(
+                "SELECT id, path, size, owner, pid, created_at FROM reservations "
+                "ORDER BY id"
+            )
+        ]
+        dead = {r.pid for r in reservations if not _pid_alive(r.pid)}
+        for pid in dead:
+            logger.info(f"Dropping disk reservations of exited process {pid}")
+            conn.execute("DELETE FROM reservations WHERE pid = ?", (pid,))
+        return [r for r in reservations if r.pid not in dead]
+
+    def _measure(self, reservations, path=None):
+        os.makedirs(self.root, exist_ok=True)
+        stats = os.statvfs(self.root)
+        free = stats.f_bavail * stats.f_frsize
+        outstanding = {r.id: r.outstanding() for r in reservations}
+        already_allocated = 0
+        if path is not None:
+            try:
+                already_allocated = os.stat(path).st_blocks * 512
+            except FileNotFoundError:
+                pass
+        return free, outstanding, already_allocated
+
+    def _snapshot(self):
+        with self._lock:
+            reservations = self._reservations(self._connection())
+        free, outstanding, _ = self._measure(reservations)
+        return reservations, free, outstanding
+
+    def _reserve(self, path, size, owner):
+        with self._lock:
+            conn = self._connection()
+            # Held until the row is inserted, so other processes cannot admit
+            # a download against the same free space in between
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                reservations = self._reservations(conn)
+                free, outstanding, allocated = self._measure(reservations, path)
+                needed = max(size - allocated, 0)
+                available = self._available(free, outstanding)
+                if needed > available:
+                    raise InsufficientSpaceError(needed, available)
+                reservation = Reservation(None, path, size, owner)
+                reservation.id = conn.execute(
+                    "INSERT INTO reservations (path, size, owner, pid, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (path, size, owner, reservation.pid, reservation.created_at),
+                ).lastrowid
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return reservation, needed, available
+
+    def _delete(self, reservation_id):
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM reservations WHERE id = ?", (reservation_id,)
+            )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _available(self, free, outstanding):
+        return free - sum(outstanding.values()) - self.headroom
+
+    async def check(self, size):
+        """Raise InsufficientSpaceError if size bytes could not be reserved now"""
+        _, free, outstanding = await self._run(self._snapshot)
+        available = self._available(free, outstanding)
+        if size > available:
+            raise InsufficientSpaceError(size, available)
+
+    async def reserve(self, path, size, owner=""):
+        """Reserve space for a download to path, counting blocks it already has"""
+        reservation, needed, available = await self._run(
+            self._reserve, path, size, owner
+        )
+        self._held.add(reservation.id)
+        logger.info(
+            f"Reserved {format_size(needed)} for {os.path.basename(path)} "
+            f"({format_size(available - needed)} left)"
+        )
+        return reservation
+
+    def release(self, reservation):
+        if reservation.id in self._held:
+            self._held.discard(reservation.id)
+            # Not awaited, so a release in a cancelled task still happens
+            asyncio.get_running_loop().run_in_executor(
+                None, self._delete, reservation.id
+            )
+
+    async def report(self):
+        reservations, free, outstanding = await self._run(self._snapshot)
+        lines = [
+            f"💾 Free on {self.root}: {format_size(free)}",
+            f"📌 Reserved for downloads: {format_size(sum(outstanding.values()))}",
+            f"🛟 Headroom kept free: {format_size(self.headroom)}",
+            f"✅ Available for new downloads: "
+            f"{format_size(max(self._available(free, outstanding), 0))}",
+        ]
+        if reservations:
+            lines.append("\nReservations:")
+        for reservation in reservations:
+            age = format_duration(time() - reservation.created_at)
+            lines.append(
+                f"• {os.path.basename(reservation.path)} ({reservation.owner}): "
+                f"{format_size(reservation.size)}, "
+                f"{format_size(outstanding.get(reservation.id, 0))} outstanding, {age}"
+            )
+        return "\n".join(lines)
+
+
+disk_space = DiskSpaceLedger()
@@ -1,103 +1,641 @@
 import os
+import asyncio
+import heapq
+import itertools
 import logging
-import magic
+from collections import deque
 from telethon.tl.types import DocumentAttributeFilename
-from config import DOWNLOAD_DIR, ADMIN_CHAT_ID, BOT_TOKEN
-from utils.helpers import get_dynamic_path, format_size
-from time import time
-import requests
+from config import (
+    ALBUM_WINDOW,
+    BOT_MODE,
+    BOT_WORKERS,
+    DOWNLOAD_DIR,
+    DOWNLOAD_MAX_CONCURRENT,
+    DOWNLOAD_MAX_PER_USER,
+    PARTIAL_MAX_AGE,
+    PROGRESS_UPDATE_INTERVAL,
+)
+from utils.helpers import get_dynamic_path, format_size, format_duration
+from utils.media_classifier import classify_group
+from modules.parallel_download import ParallelDownloader
+from modules.dedup_index import dedup_index
+from modules.disk_space import InsufficientSpaceError, disk_space
+from modules.notifier import admin_notifier
+from modules.post_process import post_processor
+from modules.metrics import metrics
+from modules.plex import plex_refresher
+from telethon.errors import FloodWaitError
+from time import monotonic, time
 
 logger = logging.getLogger(__name__)
 
+# Downloads are staged here, inside DOWNLOAD_DIR so publishing is a same
+# filesystem rename; dot directories are skipped by library scans
+PARTIAL_DIR = os.path.join(DOWNLOAD_DIR, ".partial")
+# Keeps an album summary within Telegram's message length limit
+MAX_SUMMARY_LINES = 30
 
-async def progress_callback(current, total, event, file_name, start_time):
-    percent = (current / total) * 100
 
-    # Log progress when download starts and completes
-    if current == 0 or current == total:
-        logger.info(f"Download progress for {file_name}: {percent:.1f}%")
+class ProgressReporter:
+    """Keeps one status message up to date while a file downloads.
 
-    # Update user when download starts and completes
-    if current == 0:
-        await event.reply(f"Starting download of {file_name}...")
-    elif current == total:
-        elapsed_time = time() - start_time
-        minutes = int(elapsed_time // 60)
-        seconds = int(elapsed_time % 60)
-        await event.reply(
-            f"Download of {file_name} completed in {minutes} minute(s) and {seconds} second(s)."
+    The per-chunk call only compares a timestamp; the message is re-rendered
+    and edited at most once per interval, and the interval backs off when
+    Telegram answers with a FloodWaitError.
+    """
+
+    def __init__(self, message, file_name, interval=PROGRESS_UPDATE_INTERVAL):
+        self.message = message
+        self.file_name = file_name
+        self.interval = interval
+        self.start_time = monotonic()
+        self.next_update = self.start_time + interval
+        self.current = 0
+        self.total = 0
+        self._task = None
+
+    def __call__(self, current, total):
+        metrics.download_bytes.inc(amount=max(current - self.current, 0))
+        self.current = current
+        self.total = total
+        now = monotonic()
+        if now >= self.next_update and (self._task is None or self._task.done()):
+            self.next_update = now + self.interval
+            self._task = asyncio.ensure_future(self._edit(self._render(now)))
+
+    def _render(self, now):
+        elapsed = max(now - self.start_time, 1e-6)
+        speed = self.current / elapsed
+        percent = self.current * 100 / self.total if self.total else 0
+        eta = (self.total - self.current) / speed if speed else 0
+        return (
+            f"⬇️ Downloading {self.file_name}\n"
+            f"{percent:.1f}% of {format_size(self.total)}\n"
+            f"Speed: {format_size(speed)}/s • ETA: {format_duration(eta)}"
+        )
+
+    async def _edit(self, text):
+        try:
+            await self.message.edit(text)
+        except FloodWaitError as e:
+            self.interval *= 2
+            self.next_update = monotonic() + max(e.seconds, self.interval)
+            logger.warning(
+                f"Flood wait of {e.seconds}s while reporting progress, "
+                f"slowing updates to every {self.interval:.0f}s"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update download progress: {str(e)}")
+
+    async def finish(self, details=None):
+        if self._task is not None:
+            await self._task
+        elapsed = monotonic() - self.start_time
+        if elapsed:
+            metrics.download_speed.observe(self.total / elapsed)
+        speed = format_size(self.total / elapsed) if elapsed else format_size(0)
+        logger.info(f"Download of {self.file_name} completed in {elapsed:.1f}s")
+        text = (
+            f"✅ Download of {self.file_name} ({format_size(self.total)}) completed "
+            f"in {format_duration(elapsed)} ({speed}/s average)."
         )
+        await self._edit(f"{text}\n{details}" if details else text)
+
+
+def staging_path(document, relative_path):
+    """Where a document is downloaded before being published to relative_path.
+
+    The name is stable per document so an interrupted download resumes from
+    its ``.parts`` journal on the next attempt.
+    """
+    return os.path.join(PARTIAL_DIR, f"{document.id}-{os.path.basename(relative_path)}")
+
+
+class PartialSweeper:
+    """Deletes staged downloads that nobody has resumed for max_age seconds.
+
+    A failed or cancelled download keeps its preallocated staging file so a
+    retry can resume, but its disk reservation ends with the attempt. The
+    sweep runs in the executor at most once per interval, when a download
+    starts, and judges age by the newer of the file and its journal.
+    """
+
+    def __init__(self, directory=PARTIAL_DIR, max_age=PARTIAL_MAX_AGE, interval=3600):
+        self.directory = directory
+        self.max_age = max_age
+        self.interval = interval
+        self._last_run = None
+        self._task = None
+
+    def sweep(self):
+        """Remove expired staging files; returns (files removed, bytes freed)"""
+        try:
+            names = set(os.listdir(self.directory))
+        except FileNotFoundError:
+            return 0, 0
+        now = time()
+        removed = freed = 0
+        for name in names:
+            data_name = name[: -len(".parts")] if name.endswith(".parts") else name
+            if data_name != name and data_name in names:
+                continue  # Handled along with its data file
+            paths = [os.path.join(self.directory, data_name)]
+            paths.append(f"{paths[0]}.parts")
+            stats = []
+            for path in paths:
+                try:
+                    stats.append(os.stat(path))
+                except FileNotFoundError:
+                    pass
+            if not stats or now - max(st.st_mtime for st in stats) < self.max_age:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+            freed += sum(st.st_blocks * 512 for st in stats)
+        return removed, freed
+
+    async def _run(self):
+        try:
+            loop = asyncio.get_running_loop()
+            removed, freed = await loop.run_in_executor(None, self.sweep)
+            if removed:
+                logger.info(
+                    f"Removed {removed} abandoned partial download(s), "
+                    f"freeing {format_size(freed)}"
+                )
+        except Exception as e:
+            logger.error(f"Failed to clean up partial downloads: {str(e)}")
+
+    def schedule(self):
+        if self._task is not None and not self._task.done():
+            return
+        if self._last_run is not None and monotonic() - self._last_run < self.interval:
+            return
+        self._last_run = monotonic()
+        self._task = asyncio.ensure_future(self._run())
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish_file(staged_path, file_path):
+    """Flush a finished download to disk and atomically rename it into the library.
+
+    Plex only ever sees the complete file appear under its final name.
+    """
+    fd = os.open(staged_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    os.replace(staged_path, file_path)
+    _fsync_dir(os.path.dirname(file_path))
+
+
+def get_file_name(document):
+    for attr in document.attributes:
+        if isinstance(attr, DocumentAttributeFilename):
+            return attr.file_name
+    return "unknown_file"
+
+
+def _sender_info(sender):
+    """Describe a sender for admin alerts, or None if they should not be alerted on"""
+    sender_username = sender.username if sender.username else "No username"
+    # Only send alert if the sender is not 'shareef945'
+    if sender_username.lower() == "shareef945":
+        logger.info(f"Download by shareef945, skipping alert.")
+        return None
+    return (
+        f"@{sender.username}"
+        if sender.username
+        else f"{sender.first_name} {sender.last_name}"
+    )
+
+
+async def _publish(document, staged_path, relative_path, file_name):
+    """Post-process a finished download, move it into the library and index it.
+
+    If its checksum matches a file already in the library, the download is
+    discarded instead and details["duplicate_of"] names the existing file.
+    """
+    # Permissions, MIME type, checksum and media probe run in a worker
+    # pool, on the staged file so Plex never sees it half-processed
+    details = await post_processor.process(staged_path)
+    loop = asyncio.get_running_loop()
+    if details.get("sha256"):
+        existing_path = await dedup_index.find_same_content(
+            document.size, details["sha256"]
+        )
+        if existing_path and existing_path != relative_path:
+            # Same bytes under another name; keep the copy that is there
+            await loop.run_in_executor(None, os.remove, staged_path)
+            logger.info(f"Discarded {file_name}, same content as {existing_path}")
+            details["duplicate_of"] = existing_path
+            return details
+    file_path = os.path.join(DOWNLOAD_DIR, relative_path)
+    await loop.run_in_executor(None, publish_file, staged_path, file_path)
+    plex_refresher.schedule(relative_path)
+    await dedup_index.record(document, relative_path, file_name, details)
+    logger.info(f"File downloaded: {file_path}")
+    return details
 
 
 async def handle_file_download(event, client):
     if event.document:
         try:
-            attributes = event.document.attributes
-            for attr in attributes:
-                if isinstance(attr, DocumentAttributeFilename):
-                    file_name = attr.file_name
-                    break
-            else:
-                file_name = "unknown_file"
+            file_name = get_file_name(event.document)
 
             file_size = event.document.size
             human_readable_size = format_size(file_size)
             logger.info(f"Received file: {file_name} ({human_readable_size})")
-            await event.reply(
-                f"Starting download of {file_name} ({human_readable_size}). Please wait."
+
+            relative_path = get_dynamic_path(file_name)
+            existing_path = await dedup_index.find_duplicate(
+                event.document, relative_path
             )
-            # Get sender information
-            sender = await event.get_sender()
-            sender_username = sender.username if sender.username else "No username"
-
-            # Only send alert if the sender is not 'shareef945'
-            if sender_username.lower() != "shareef945":
-                sender_info = (
-                    f"@{sender.username}"
-                    if sender.username
-                    else f"{sender.first_name} {sender.last_name}"
+            if existing_path:
+                logger.info(
+                    f"Skipping duplicate {file_name}, already at {existing_path}"
+                )
+                await event.reply(
+                    f"♻️ {file_name} is already in the library:\n{existing_path}"
                 )
-                alert_message = f"🚨 File Download Alert 🚨\nUser: {sender_info}\nFile: {file_name}\nSize: {human_readable_size}"
+                return
 
-                try:
-                    admin_chat_id = int(ADMIN_CHAT_ID)  # Convert to integer
-                    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-                    payload = {"chat_id": admin_chat_id, "text": alert_message}
-                    response = requests.post(url, json=payload)
-                    if response.status_code != 200:
-                        logger.error(
-                            f"Failed to send alert to admin. Status code: {response.status_code}"
-                        )
-                except Exception as alert_error:
-                    logger.error(f"Failed to send alert to admin: {str(alert_error)}")
-            else:
-                logger.info(f"Download by shareef945, skipping alert.")
+            staged_path = staging_path(event.document, relative_path)
+            try:
+                reservation = await disk_space.reserve(
+                    staged_path, file_size, owner=str(event.sender_id)
+                )
+            except InsufficientSpaceError as e:
+                logger.warning(f"Refusing {file_name}: {str(e)}")
+                await event.reply(
+                    f"💾 Can't download {file_name} right now. {str(e)}.\n"
+                    "Please try again once space has been freed."
+                )
+                return
 
-            relative_path = get_dynamic_path(file_name)
-            file_path = os.path.join(DOWNLOAD_DIR, relative_path)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-            start_time = time()
-            await client.download_media(
-                event.message,
-                file_path,
-                progress_callback=lambda current, total: progress_callback(
-                    current, total, event, file_name, start_time
-                ),
-            )
+            try:
+                status_message = await event.reply(
+                    f"Starting download of {file_name} ({human_readable_size}). Please wait."
+                )
+                sender_info = _sender_info(await event.get_sender())
+                if sender_info:
+                    admin_notifier.notify_download(
+                        sender_info, file_name, human_readable_size
+                    )
 
-            # Set correct file permissions after download
-            os.chmod(file_path, 0o644)
+                os.makedirs(PARTIAL_DIR, exist_ok=True)
+                partial_sweeper.schedule()
 
-            mime = magic.Magic(mime=True)
-            file_type = mime.from_file(file_path)
+                progress = ProgressReporter(status_message, file_name)
+                with metrics.track("telegram_download"):
+                    await ParallelDownloader(client).download(
+                        event.document, staged_path, progress_callback=progress
+                    )
+                await progress.finish()
+            finally:
+                disk_space.release(reservation)
 
+            details = await _publish(
+                event.document, staged_path, relative_path, file_name
+            )
+            if details.get("duplicate_of"):
+                await event.reply(
+                    f"♻️ {file_name} is already in the library:\n"
+                    f"{details['duplicate_of']}"
+                )
+                return
+            file_type = details["mime_type"]
             if not file_type.startswith("video/"):
                 logger.warning(f"File type mismatch. MIME type: {file_type}")
-
-            logger.info(f"File downloaded: {file_path}")
+                await event.reply(
+                    f"⚠️ {file_name} was saved, but it does not look like a video "
+                    f"(detected type: {file_type})."
+                )
         except Exception as e:
             logger.error(f"Error downloading file: {str(e)}")
             await event.reply("Sorry, there was an error downloading the file.")
     else:
         await event.reply("Please send a file to download.")
+
+
+async def handle_album_download(events, client):
+    """Download the documents of one Telegram album as a single batch.
+
+    The files are classified together, so episodes of a season pack share one
+    show folder, and downloaded one after another behind a single status
+    message with combined progress. The user gets one alert and one summary
+    instead of a set of replies per file.
+    """
+    first = events[0]
+    try:
+        documents = [event.document for event in events]
+        file_names = [get_file_name(document) for document in documents]
+        total_size = sum(document.size for document in documents)
+        logger.info(
+            f"Received album of {len(events)} files ({format_size(total_size)})"
+        )
+
+        items, skipped = [], []
+        for document, file_name, media in zip(
+            documents, file_names, classify_group(file_names)
+        ):
+            existing_path = await dedup_index.find_duplicate(document, media.path)
+            if existing_path:
+                skipped.append(f"♻️ {file_name} (already at {existing_path})")
+            else:
+                items.append((document, file_name, media.path))
+
+        if not items:
+            await first.reply(
+                "♻️ Every file in this album is already in the library:\n"
+                + "\n".join(skipped)
+            )
+            return
+
+        download_size = sum(document.size for document, _, _ in items)
+        reservations = []
+        try:
+            for document, _, relative_path in items:
+                reservations.append(
+                    await disk_space.reserve(
+                        staging_path(document, relative_path),
+                        document.size,
+                        owner=str(first.sender_id),
+                    )
+                )
+        except InsufficientSpaceError as e:
+            for reservation in reservations:
+                disk_space.release(reservation)
+            needed = format_size(download_size)
+            logger.warning(f"Refusing album of {len(items)} files: {str(e)}")
+            await first.reply(
+                f"💾 Can't download this album ({needed}) right now. {str(e)}.\n"
+                "Please try again once space has been freed."
+            )
+            return
+
+        label = f"album of {len(items)} files"
+        saved, failed = [], []
+        try:
+            status_message = await first.reply(
+                f"Starting download of {label} ({format_size(download_size)}). "
+                "Please wait."
+            )
+            sender_info = _sender_info(await first.get_sender())
+            if sender_info:
+                admin_notifier.notify_album(
+                    sender_info,
+                    [file_name for _, file_name, _ in items],
+                    format_size(download_size),
+                )
+
+            os.makedirs(PARTIAL_DIR, exist_ok=True)
+            partial_sweeper.schedule()
+            progress = ProgressReporter(status_message, label)
+            downloader = ParallelDownloader(client)
+            done = 0
+            for document, file_name, relative_path in items:
+                staged_path = staging_path(document, relative_path)
+                try:
+                    with metrics.track("telegram_download"):
+                        await downloader.download(
+                            document,
+                            staged_path,
+                            progress_callback=lambda current, _, base=done: progress(
+                                base + current, download_size
+                            ),
+                        )
+                    details = await _publish(
+                        document, staged_path, relative_path, file_name
+                    )
+                except Exception as e:
+                    logger.error(f"Error downloading {file_name}: {str(e)}")
+                    failed.append(f"❌ {file_name}")
+                else:
+                    done += document.size
+                    file_type = details["mime_type"]
+                    if details.get("duplicate_of"):
+                        skipped.append(
+                            f"♻️ {file_name} (already at {details['duplicate_of']})"
+                        )
+                    elif file_type.startswith("video/"):
+                        saved.append(f"✅ {relative_path}")
+                    else:
+                        logger.warning(f"File type mismatch. MIME type: {file_type}")
+                        saved.append(f"⚠️ {relative_path} (detected type: {file_type})")
+
+            progress.total = done
+            lines = saved + skipped + failed
+            summary = (
+                f"{len(saved)} saved, {len(skipped)} already in the library, "
+                f"{len(failed)} failed.\n" + "\n".join(lines[:MAX_SUMMARY_LINES])
+            )
+            if len(lines) > MAX_SUMMARY_LINES:
+                summary += f"\n…and {len(lines) - MAX_SUMMARY_LINES} more"
+            await progress.finish(summary)
+        finally:
+            for reservation in reservations:
+                disk_space.release(reservation)
+    except Exception as e:
+        logger.error(f"Error downloading album: {str(e)}")
+        await first.reply("Sorry, there was an error downloading the album.")
+
+
+class DownloadJob:
+    def __init__(self, job_id, events, client):
+        self.id = job_id
+        self.events = events
+        self.event = events[0]
+        self.client = client
+        self.user_id = self.event.sender_id
+        if len(events) > 1:
+            self.file_name = f"album of {len(events)} files"
+        else:
+            self.file_name = get_file_name(self.event.document)
+        self.size = sum(event.document.size for event in events)
+        self.status = "queued"
+        self.task = None
+
+
+class DownloadScheduler:
+    """Runs downloads with global and per-user concurrency limits.
+
+    Each user has their own queue ordered smallest file first, and free slots
+    are handed out round-robin across users so one large batch cannot starve
+    everyone else. A document can only be in one queued or running job at a
+    time, since both would download into the same staging file.
+    """
+
+    def __init__(
+        self, max_concurrent=DOWNLOAD_MAX_CONCURRENT, max_per_user=DOWNLOAD_MAX_PER_USER
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.jobs = {}
+        self._queues = {}
+        self._rotation = deque()
+        self._running_per_user = {}
+        self._running = 0
+        self._ids = itertools.count(1)
+        self._documents = {}
+
+    def submit(self, event, client):
+        return self.submit_album([event], client)
+
+    def submit_album(self, events, client):
+        """Queue several documents (an album) as one job"""
+        job = DownloadJob(next(self._ids), events, client)
+        self.jobs[job.id] = job
+        for event in events:
+            self._documents[event.document.id] = job
+        heapq.heappush(
+            self._queues.setdefault(job.user_id, []), (job.size, job.id, job)
+        )
+        if job.user_id not in self._rotation:
+            self._rotation.append(job.user_id)
+        self._pump()
+        return job
+
+    def active_job(self, document):
+        """The queued or running job that already covers document, if any"""
+        return self._documents.get(document.id)
+
+    def _forget(self, job):
+        self.jobs.pop(job.id, None)
+        for event in job.events:
+            if self._documents.get(event.document.id) is job:
+                del self._documents[event.document.id]
+
+    def queued_jobs(self):
+        return sorted(
+            (job for job in self.jobs.values() if job.status == "queued"),
+            key=lambda job: (job.size, job.id),
+        )
+
+    def running_jobs(self):
+        return [job for job in self.jobs.values() if job.status == "running"]
+
+    def _next_user(self):
+        for _ in range(len(self._rotation)):
+            user_id = self._rotation[0]
+            self._rotation.rotate(-1)
+            if self._running_per_user.get(user_id, 0) < self.max_per_user:
+                return user_id
+        return None
+
+    def _pump(self):
+        while self._running < self.max_concurrent and self._rotation:
+            user_id = self._next_user()
+            if user_id is None:
+                return
+
+            queue = self._queues[user_id]
+            _, _, job = heapq.heappop(queue)
+            if not queue:
+                del self._queues[user_id]
+                self._rotation.remove(user_id)
+
+            job.status = "running"
+            self._running += 1
+            self._running_per_user[user_id] = self._running_per_user.get(user_id, 0) + 1
+            job.task = asyncio.ensure_future(self._run(job))
+
+    async def _run(self, job):
+        try:
+            if len(job.events) > 1:
+                await handle_album_download(job.events, job.client)
+            else:
+                await handle_file_download(job.event, job.client)
+        except asyncio.CancelledError:
+            logger.info(f"Download #{job.id} ({job.file_name}) cancelled")
+            await job.event.reply(f"🛑 Download of {job.file_name} cancelled.")
+        finally:
+            self._forget(job)
+            self._running -= 1
+            self._running_per_user[job.user_id] -= 1
+            if not self._running_per_user[job.user_id]:
+                del self._running_per_user[job.user_id]
+            self._pump()
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        if job.status == "running":
+            job.task.cancel()
+            return job
+
+        queue = self._queues[job.user_id]
+        queue.remove((job.size, job.id, job))
+        heapq.heapify(queue)
+        if not queue:
+            del self._queues[job.user_id]
+            self._rotation.remove(job.user_id)
+        self._forget(job)
+        job.status = "cancelled"
+        return job
+
+
+class AlbumCollector:
+    """Gathers the documents of a Telegram album before they are scheduled.
+
+    Telegram delivers an album as separate messages sharing a grouped_id.
+    Messages are held per sender and group until none has arrived for the
+    album window, then handed to the callback together, in message order.
+    """
+
+    def __init__(self, window=ALBUM_WINDOW):
+        self.window = window
+        self._albums = {}
+
+    def add(self, event, callback):
+        key = (event.sender_id, event.message.grouped_id)
+        events, timer = self._albums.get(key, ([], None))
+        if timer is not None:
+            timer.cancel()
+        events.append(event)
+        timer = asyncio.get_running_loop().call_later(
+            self.window, self._flush, key, callback
+        )
+        self._albums[key] = (events, timer)
+
+    def _flush(self, key, callback):
+        events, _ = self._albums.pop(key)
+        events.sort(key=lambda event: event.message.id)
+        asyncio.ensure_future(callback(events))
+
+
+# Each scale-out worker process has its own scheduler, so they split the limit.
+# A user's chat always lands on the same worker, so the per-user limit holds.
+download_scheduler = DownloadScheduler(
+    max_concurrent=(
+        max(1, DOWNLOAD_MAX_CONCURRENT // BOT_WORKERS)
+        if BOT_MODE == "scaleout"
+        else DOWNLOAD_MAX_CONCURRENT
+    )
+)
+album_collector = AlbumCollector()
+partial_sweeper = PartialSweeper()
+metrics.gauge(
+    "rpa_downloads",
+    "Downloads by state",
+    lambda: {
+        ("running",): download_scheduler._running,
+        ("queued",): len(download_scheduler.queued_jobs()),
+    },
+    labels=("state",),
+)
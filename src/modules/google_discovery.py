@@ -0,0 +1,55 @@
+import json
+import logging
+from functools import lru_cache
+
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_discovery_document(service_name, version):
+    """Parsed discovery document from the copy bundled with googleapiclient.
+
+    Parsed once per process, so later builds skip the JSON decode of the
+    (large) Drive and Sheets documents. None if no bundled copy exists.
+    """
+    content = discovery_cache.get_static_doc(service_name, version)
+    if content is None:
+        return None
+    return json.loads(content)
+
+
+class CachedResource:
+    """Wraps a googleapiclient Resource so nested resources are built once.
+
+    googleapiclient builds a fresh Resource on every ``spreadsheets()`` or
+    ``values()`` call, generating all of its methods and their docstrings,
+    which takes milliseconds of event-loop time per request.
+    """
+
+    def __init__(self, resource):
+        self._resource = resource
+        self._children = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._resource, name)
+        if not getattr(attr, "__is_resource__", False):
+            return attr
+
+        def nested():
+            child = self._children.get(name)
+            if child is None:
+                child = self._children[name] = CachedResource(attr())
+            return child
+
+        return nested
+
+
+def build_service(service_name, version, credentials):
+    document = get_discovery_document(service_name, version)
+    if document is None:
+        logger.info(f"No bundled discovery document for {service_name} {version}")
+        return CachedResource(build(service_name, version, credentials=credentials))
+    return CachedResource(build_from_document(document, credentials=credentials))
@@ -98,9 +98,13 @@
 #         )
 #         return result
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from modules.google_discovery import build_service
+from modules.google_transport import GoogleApiTransport
+from modules.metrics import metrics
+from modules.sheets_write_queue import SheetsWriteQueue
 import logging
+import weakref
 
 logger = logging.getLogger(__name__)
 
@@ -110,38 +114,67 @@ SCOPES = [
 ]
 SERVICE_ACCOUNT_FILE = "service-account.json"
 
+# Write queues of every live module, summed by the pending-appends gauge
+_write_queues = weakref.WeakSet()
+
 
 class GoogleSheetsModule:
+    """Sheets/Drive access for the bot.
+
+    Credentials and API clients are created on first use rather than at
+    plugin setup, so starting the bot does not read the service account file
+    or build discovery clients.
+    """
+
     def __init__(self):
-        self.service = None
-        self.drive_service = None
-        self.current_workbook = None
-        self.current_worksheet = None
-        self.credentials = None
-        self.setup_service()
-
-    def setup_service(self):
-        try:
-            self.credentials = service_account.Credentials.from_service_account_file(
+        self._credentials = None
+        self._transport = None
+        self._service = None
+        self._drive_service = None
+        self.write_queue = SheetsWriteQueue(self)
+        _write_queues.add(self.write_queue)
+
+    @property
+    def credentials(self):
+        if self._credentials is None:
+            self._credentials = service_account.Credentials.from_service_account_file(
                 SERVICE_ACCOUNT_FILE, scopes=SCOPES
             )
-            # Try to initialize both services
-            try:
-                self.service = build("sheets", "v4", credentials=self.credentials)
-                logger.info("Sheets API service initialized successfully")
-            except HttpError as e:
-                logger.error(f"Failed to initialize Sheets API: {str(e)}")
-
-            try:
-                self.drive_service = build("drive", "v3", credentials=self.credentials)
-                logger.info("Drive API service initialized successfully")
-            except HttpError as e:
-                logger.error(f"Failed to initialize Drive API: {str(e)}")
-
-            return True
+        return self._credentials
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = GoogleApiTransport(self.credentials)
+        return self._transport
+
+    def _build(self, name, version, label):
+        try:
+            service = build_service(name, version, self.credentials)
+            logger.info(f"{label} API service initialized successfully")
+            return service
         except Exception as e:
-            logger.error(f"Failed to setup Google services: {str(e)}")
-            return False
+            logger.error(f"Failed to initialize {label} API: {str(e)}")
+            return None
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = self._build("sheets", "v4", "Sheets")
+        return self._service
+
+    @property
+    def drive_service(self):
+        if self._drive_service is None:
+            self._drive_service = self._build("drive", "v3", "Drive")
+        return self._drive_service
+
+    def warm(self):
+        """Read the credentials and build the API clients ahead of first use.
+        Blocking, so callers run it in an executor."""
+        # Each property creates its object on first access
+        for name in ("credentials", "transport", "service", "drive_service"):
+            getattr(self, name)
 
     async def list_workbooks(self):
         try:
@@ -154,14 +187,12 @@ class GoogleSheetsModule:
                 logger.error(error_msg)
                 raise Exception(error_msg)
 
-            results = (
-                self.drive_service.files()
-                .list(
+            results = await self.transport.execute(
+                self.drive_service.files().list(
                     q="mimeType='application/vnd.google-apps.spreadsheet'",
                     fields="files(id, name)",
                     pageSize=50,
                 )
-                .execute()
             )
 
             files = results.get("files", [])
@@ -189,8 +220,8 @@ class GoogleSheetsModule:
                 logger.error("Sheets service not initialized")
                 return []
 
-            sheet_metadata = (
-                self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+            sheet_metadata = await self.transport.execute(
+                self.service.spreadsheets().get(spreadsheetId=spreadsheet_id)
             )
 
             sheets = sheet_metadata.get("sheets", [])
@@ -206,11 +237,10 @@ class GoogleSheetsModule:
     async def get_headers(self, spreadsheet_id, sheet_name):
         try:
             range_name = f"{sheet_name}!1:1"
-            result = (
+            result = await self.transport.execute(
                 self.service.spreadsheets()
                 .values()
                 .get(spreadsheetId=spreadsheet_id, range=range_name)
-                .execute()
             )
 
             headers = result.get("values", [[]])[0]
@@ -226,19 +256,9 @@ class GoogleSheetsModule:
             if not self.service:
                 raise Exception("Sheets service not initialized")
 
-            range_name = f"{sheet_name}!A:A"
-            body = {"values": [values]}
-
-            result = (
-                self.service.spreadsheets()
-                .values()
-                .append(
-                    spreadsheetId=spreadsheet_id,
-                    range=range_name,
-                    valueInputOption="USER_ENTERED",
-                    body=body,
-                )
-                .execute()
+            # /add_row has always written over the empty rows below the table
+            result = await self.write_queue.append(
+                spreadsheet_id, sheet_name, values, insert_rows=False
             )
 
             logger.info(f"Successfully added row to {sheet_name}")
@@ -247,3 +267,30 @@ class GoogleSheetsModule:
         except Exception as e:
             logger.error(f"Failed to add row: {str(e)}")
             raise
+
+    async def get_revision(self, spreadsheet_id):
+        """Return the Drive version of a spreadsheet, which changes on every edit"""
+        try:
+            if not self.drive_service:
+                return None
+
+            result = await self.transport.execute(
+                self.drive_service.files().get(fileId=spreadsheet_id, fields="version")
+            )
+            return result.get("version")
+
+        except Exception as e:
+            logger.error(f"Error getting spreadsheet revision: {str(e)}")
+            return None
+
+    async def close(self):
+        await self.write_queue.close()
+        if self._transport:
+            self._transport.shutdown()
+
+
+metrics.gauge(
+    "rpa_sheets_appends_pending",
+    "Sheets rows waiting to be appended",
+    lambda: sum(queue.pending() for queue in _write_queues),
+)
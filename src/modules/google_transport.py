@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import google_auth_httplib2
+import httplib2
+
+from config import GOOGLE_API_MAX_WORKERS, GOOGLE_API_TIMEOUT
+from modules.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GoogleApiTransport:
+    """Runs Sheets/Drive requests on a bounded, dedicated thread pool.
+
+    httplib2 connections are not thread-safe, so every worker thread keeps its
+    own authorized HTTP session and reuses it for all requests it executes.
+    """
+
+    def __init__(self, credentials, max_workers=GOOGLE_API_MAX_WORKERS):
+        self.credentials = credentials
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="google-api"
+        )
+        self._local = threading.local()
+
+    def _get_http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=GOOGLE_API_TIMEOUT)
+            )
+            self._local.http = http
+        return http
+
+    def _execute(self, request):
+        return request.execute(http=self._get_http())
+
+    async def execute(self, request):
+        """Execute a googleapiclient request without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        integration = "drive" if "/drive/" in request.uri else "sheets"
+        with metrics.track(integration):
+            return await loop.run_in_executor(self._executor, self._execute, request)
+
+    def shutdown(self, wait=True):
+        logger.info("Shutting down Google API transport")
+        self._executor.shutdown(wait=wait)
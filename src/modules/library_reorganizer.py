@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+from config import DOWNLOAD_DIR, REORGANIZE_BATCH_SIZE, REORGANIZE_WORKERS, STATE_DIR
+from modules.dedup_index import IGNORED_SUFFIXES, dedup_index
+from utils.media_classifier import classify_many
+
+logger = logging.getLogger(__name__)
+
+# Top-level folders the bot files downloads into; anything else is left alone
+LIBRARY_SECTIONS = ("movies", "tv-shows")
+PLAN_PATH = os.path.join(STATE_DIR, "reorganize-plan.jsonl")
+DONE_PATH = os.path.join(STATE_DIR, "reorganize-done.log")
+
+# The plan and journal are shared, so only one apply may run at a time
+_apply_lock = threading.Lock()
+
+
+def iter_library(library_dir=DOWNLOAD_DIR, sections=LIBRARY_SECTIONS):
+    """Yield library-relative paths of media files, streaming via os.scandir"""
+    stack = [os.path.join(library_dir, section) for section in sections]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and not (
+                        entry.name.endswith(IGNORED_SUFFIXES)
+                    ):
+                        yield os.path.relpath(entry.path, library_dir)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Skipping {directory}: {str(e)}")
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ReorganizeReport:
+    def __init__(self):
+        self.scanned = 0
+        self.in_place = 0
+        self.unknown = 0
+        self.conflicts = []
+        self.moves = []
+        self.moved = 0
+        self.failed = []
+        self.resumed = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        handled = self.moved if self.moved else self.scanned
+        return handled / self.elapsed if self.elapsed else 0.0
+
+    def format(self, sample=10):
+        lines = [
+            f"📂 Scanned {self.scanned} files ({self.rate:.0f} files/s)",
+            f"✅ Already in place: {self.in_place}",
+            f"❔ Original name unknown (classified by current name): {self.unknown}",
+            f"⚠️ Conflicts: {len(self.conflicts)}",
+            f"🚚 Moves planned: {len(self.moves)}",
+        ]
+        if self.moved or self.failed or self.resumed:
+            lines.append(f"✅ Moved: {self.moved} (resumed past {self.resumed})")
+            lines.append(f"❌ Failed: {len(self.failed)}")
+        for source, target in self.moves[:sample]:
+            lines.append(f"- {source}\n+ {target}")
+        if len(self.moves) > sample:
+            lines.append(f"… and {len(self.moves) - sample} more")
+        for source, target in self.conflicts[:sample]:
+            lines.append(f"⚠️ {source}\n  would become {target}")
+        if len(self.conflicts) > sample:
+            lines.append(f"… and {len(self.conflicts) - sample} more conflicts")
+        return "\n".join(lines)
+
+
+class LibraryReorganizer:
+    """Moves existing downloads to where the current naming rules put them.
+
+    Files are re-classified from the name the bot originally received them
+    under (kept in the dedup index), because already renamed files do not
+    classify back to the same path. Files from before the index existed are
+    classified by their current name and only moved if that keeps the name;
+    otherwise they are reported as conflicts. A plan is written first; applying it
+    renames files in a thread pool, never copying, and appends each finished
+    move to a journal so an interrupted run picks up where it stopped.
+    """
+
+    def __init__(
+        self,
+        library_dir=DOWNLOAD_DIR,
+        index=dedup_index,
+        workers=REORGANIZE_WORKERS,
+        batch_size=REORGANIZE_BATCH_SIZE,
+    ):
+        self.library_dir = library_dir
+        self.index = index
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def plan(self):
+        """Work out every move without touching the library (a dry run)"""
+        report = ReorganizeReport()
+        started = monotonic()
+        targets = set()
+        for batch in _batches(iter_library(self.library_dir), self.batch_size):
+            report.scanned += len(batch)
+            names = self.index.file_names(batch)
+            report.unknown += sum(1 for path in batch if path not in names)
+            classified = classify_many(
+                [names.get(path, os.path.basename(path)) for path in batch]
+            )
+            for path, media in zip(batch, classified):
+                if media.path == path:
+                    report.in_place += 1
+                elif path not in names and os.path.basename(
+                    media.path
+                ) != os.path.basename(path):
+                    # Renaming from an already cleaned-up name can lose parts
+                    # of it (e.g. quality tags), so only folders are fixed
+                    report.conflicts.append((path, media.path))
+                elif media.path in targets or os.path.lexists(
+                    os.path.join(self.library_dir, media.path)
+                ):
+                    report.conflicts.append((path, media.path))
+                else:
+                    targets.add(media.path)
+                    report.moves.append((path, media.path))
+        report.elapsed = monotonic() - started
+        logger.info(
+            f"Reorganize plan: {len(report.moves)} moves, "
+            f"{len(report.conflicts)} conflicts across {report.scanned} files"
+        )
+        return report
+
+    def _save_plan(self, moves):
+        os.makedirs(os.path.dirname(PLAN_PATH), exist_ok=True)
+        tmp_path = f"{PLAN_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            for source, target in moves:
+                f.write(json.dumps([source, target]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, PLAN_PATH)
+
+    def _load_journal(self):
+        """Return the saved plan and the moves already done, if a run was cut short"""
+        if not os.path.exists(PLAN_PATH) or not os.path.exists(DONE_PATH):
+            return None, set()
+        with open(PLAN_PATH) as f:
+            moves = [tuple(json.loads(line)) for line in f if line.strip()]
+        with open(DONE_PATH) as f:
+            done = {line.rstrip("\n") for line in f if line.strip()}
+        return moves, done
+
+    def _move(self, source, target):
+        source_path = os.path.join(self.library_dir, source)
+        target_path = os.path.join(self.library_dir, target)
+        if not os.path.exists(source_path):
+            # Moved by an earlier, interrupted run or removed since planning
+            return "missing" if not os.path.exists(target_path) else "done"
+        if os.path.lexists(target_path):
+            return "target exists"
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # os.rename fails with EXDEV rather than copying across filesystems
+        os.rename(source_path, target_path)
+        return "done"
+
+    def _prune_empty_dirs(self, moves):
+        directories = {
+            os.path.dirname(os.path.join(self.library_dir, source))
+            for source, _ in moves
+        }
+        section_roots = {
+            os.path.join(self.library_dir, section) for section in LIBRARY_SECTIONS
+        }
+        for directory in sorted(directories, key=len, reverse=True):
+            while directory not in section_roots and directory.startswith(
+                self.library_dir
+            ):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+    def apply(self):
+        """Plan (or resume a saved plan) and move the files"""
+        if not _apply_lock.acquire(blocking=False):
+            raise RuntimeError("A library reorganization is already running")
+        try:
+            return self._apply()
+        finally:
+            _apply_lock.release()
+
+    def _apply(self):
+        moves, done = self._load_journal()
+        if moves is None:
+            report = self.plan()
+            moves = report.moves
+            self._save_plan(moves)
+            open(DONE_PATH, "w").close()
+        else:
+            report = ReorganizeReport()
+            report.moves = moves
+            report.resumed = len(done)
+            logger.info(f"Resuming reorganize: {len(done)}/{len(moves)} moves done")
+
+        started = monotonic()
+        pending = [move for move in moves if move[0] not in done]
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="reorganize"
+        ) as executor, open(DONE_PATH, "a") as journal:
+            for batch in _batches(pending, self.batch_size):
+                results = executor.map(lambda move: self._try_move(*move), batch)
+                completed = []
+                for (source, target), result in zip(batch, results):
+                    if result == "done":
+                        completed.append((source, target))
+                    else:
+                        report.failed.append((source, result))
+                if completed:
+                    self.index.rename_paths(completed)
+                    journal.write("".join(f"{source}\n" for source, _ in completed))
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                report.moved += len(completed)
+
+        self._prune_empty_dirs(moves)
+        os.remove(DONE_PATH)
+        os.remove(PLAN_PATH)
+        report.elapsed += monotonic() - started
+        logger.info(
+            f"Reorganized {report.moved} files in {report.elapsed:.1f}s "
+            f"({report.rate:.0f} files/s), {len(report.failed)} failed"
+        )
+        return report
+
+    def _try_move(self, source, target):
+        try:
+            return self._move(source, target)
+        except OSError as e:
+            return str(e)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Move existing downloads to match the current naming rules"
+    )
+    parser.add_argument(
+        "--apply", action="store_true", help="move files instead of a dry run"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    reorganizer = LibraryReorganizer()
+    report = reorganizer.apply() if args.apply else reorganizer.plan()
+    print(report.format(sample=len(report.moves)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import asyncio
+import logging
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic, perf_counter
+
+from config import LOOP_LAG_INTERVAL, METRICS_PORT
+from utils.helpers import format_duration, format_size, percentile
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Recent observations kept per label set for p50/p95/p99 in /stats
+RESERVOIR_SIZE = 1024
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def total(self, *label_values):
+        return self.values.get(label_values, 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge:
+    """A value read at scrape time from fn(), which returns a number or a
+    dict of label tuple -> number"""
+
+    def __init__(self, name, help_text, fn, labels=()):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labels = labels
+
+    def read(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            logger.warning(f"Could not read gauge {self.name}: {str(e)}")
+            return {}
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for label_values, value in self.read().items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    """Prometheus histogram that also keeps recent samples for percentiles.
+
+    observe() is a bisect plus a deque append; sorting only happens when
+    percentiles are requested.
+    """
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value, *label_values):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = {
+                "buckets": [0] * len(self.buckets),
+                "sum": 0.0,
+                "count": 0,
+                "recent": deque(maxlen=RESERVOIR_SIZE),
+            }
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series["buckets"][index] += 1
+        series["sum"] += value
+        series["count"] += 1
+        series["recent"].append(value)
+
+    def count(self, *label_values):
+        series = self.series.get(label_values)
+        return series["count"] if series else 0
+
+    def percentiles(self, *label_values, points=(50, 95, 99)):
+        series = self.series.get(label_values)
+        recent = list(series["recent"]) if series else []
+        return [percentile(recent, point) for point in points]
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["buckets"]):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {series['count']}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {series['sum']}"
+            yield f"{self.name}_count{labels} {series['count']}"
+
+
+class Metrics:
+    """Process-wide metrics, served as Prometheus text on METRICS_PORT.
+
+    Everything is updated from the event loop thread, so plain dicts are
+    enough. Gauges are callbacks evaluated only when scraped.
+    """
+
+    def __init__(self):
+        self.started_at = monotonic()
+        self.handler_latency = Histogram(
+            "rpa_handler_seconds", "Time spent in bot handlers", ("handler",)
+        )
+        self.handler_errors = Counter(
+            "rpa_handler_errors_total", "Handler calls that raised", ("handler",)
+        )
+        self.integration_latency = Histogram(
+            "rpa_integration_seconds",
+            "Latency of calls to external services",
+            ("integration",),
+        )
+        self.integration_errors = Counter(
+            "rpa_integration_errors_total",
+            "Failed calls to external services",
+            ("integration",),
+        )
+        self.download_bytes = Counter(
+            "rpa_download_bytes_total", "Bytes downloaded from Telegram"
+        )
+        self.download_speed = Histogram(
+            "rpa_download_bytes_per_second",
+            "Average speed of completed downloads",
+            buckets=tuple(2**power for power in range(16, 28)),
+        )
+        self.loop_lag = Histogram(
+            "rpa_event_loop_lag_seconds",
+            "Delay between a scheduled wake-up and the loop running it",
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+        )
+        self.gauges = []
+        self._lag_task = None
+        self._runner = None
+
+    def gauge(self, name, help_text, fn, labels=()):
+        self.gauges.append(Gauge(name, help_text, fn, labels))
+
+    @contextmanager
+    def track(self, integration):
+        """Time a call to an external service and count it if it raises"""
+        started = perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.integration_errors.inc(integration)
+            raise
+        finally:
+            self.integration_latency.observe(perf_counter() - started, integration)
+
+    def render(self):
+        families = [
+            self.handler_latency,
+            self.handler_errors,
+            self.integration_latency,
+            self.integration_errors,
+            self.download_bytes,
+            self.download_speed,
+            self.loop_lag,
+            *self.gauges,
+        ]
+        lines = [
+            "# HELP rpa_uptime_seconds Seconds since the process started",
+            "# TYPE rpa_uptime_seconds gauge",
+            f"rpa_uptime_seconds {monotonic() - self.started_at:.0f}",
+        ]
+        for family in families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Human-readable overview for the /stats command"""
+
+        def describe(histogram, label_values):
+            p50, p95, p99 = histogram.percentiles(*label_values)
+            return (
+                f"p50 {p50 * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms / "
+                f"p99 {p99 * 1000:.0f}ms"
+            )
+
+        lines = [f"⏱️ Uptime: {format_duration(monotonic() - self.started_at)}"]
+
+        if self.handler_latency.series:
+            lines.append("\n🤖 Handlers:")
+            ranked = sorted(
+                self.handler_latency.series,
+                key=lambda label_values: -self.handler_latency.count(*label_values),
+            )
+            for label_values in ranked[:10]:
+                errors = self.handler_errors.total(*label_values)
+                lines.append(
+                    f"• {label_values[0]}: {self.handler_latency.count(*label_values)} "
+                    f"calls, {errors} errors, "
+                    f"{describe(self.handler_latency, label_values)}"
+                )
+
+        if self.integration_latency.series:
+            lines.append("\n🔌 Integrations:")
+            for label_values in sorted(self.integration_latency.series):
+                errors = self.integration_errors.total(*label_values)
+                lines.append(
+                    f"• {label_values[0]}: "
+                    f"{self.integration_latency.count(*label_values)} calls, "
+                    f"{errors} errors, "
+                    f"{describe(self.integration_latency, label_values)}"
+                )
+
+        lines.append("\n⬇️ Downloads:")
+        lines.append(f"• {format_size(self.download_bytes.total())} received")
+        if self.download_speed.count():
+            p50, p95, _ = self.download_speed.percentiles()
+            lines.append(f"• Speed p50 {format_size(p50)}/s, p95 {format_size(p95)}/s")
+
+        if self.loop_lag.count():
+            lines.append(f"\n🔁 Event loop lag: {describe(self.loop_lag, ())}")
+
+        depths = []
+        for gauge in self.gauges:
+            for label_values, value in gauge.read().items():
+                labels = (
+                    f" ({', '.join(map(str, label_values))})" if label_values else ""
+                )
+                depths.append(f"• {gauge.help}{labels}: {value}")
+        if depths:
+            lines.append("\n📥 Queues:")
+            lines.extend(depths)
+        return "\n".join(lines)
+
+    async def _monitor_loop_lag(self, interval):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(max(loop.time() - expected, 0.0))
+
+    async def start(self, port=METRICS_PORT, lag_interval=LOOP_LAG_INTERVAL):
+        """Start the loop lag monitor and, if port is set, the HTTP endpoint"""
+        if self._lag_task is None:
+            self._lag_task = asyncio.ensure_future(self._monitor_loop_lag(lag_interval))
+        if not port or self._runner is not None:
+            return
+
+        from aiohttp import web
+
+        async def handle_metrics(request):
+            return web.Response(
+                text=self.render(), content_type="text/plain", charset="utf-8"
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, "0.0.0.0", port).start()
+        except OSError as e:
+            logger.error(f"Could not serve metrics on port {port}: {str(e)}")
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info(f"Serving metrics on http://0.0.0.0:{port}/metrics")
+
+    async def close(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics = Metrics()
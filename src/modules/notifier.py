@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from time import monotonic
+
+from config import ADMIN_CHAT_ID, ALERT_DIGEST_WINDOW, ALERT_TIMEOUT
+from modules.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING_ALERTS = 100
+MAX_DIGEST_LINES = 10
+
+
+class AdminNotifier:
+    """Delivers admin alerts in the background through the bot's own client.
+
+    The first alert for a key (e.g. a sender) goes out immediately. Alerts for
+    the same key within the digest window are held back and sent as a single
+    summary when the window closes. Callers only enqueue, so a slow or failing
+    send can never stall the code that raised the alert.
+    """
+
+    def __init__(
+        self,
+        chat_id=ADMIN_CHAT_ID,
+        digest_window=ALERT_DIGEST_WINDOW,
+        timeout=ALERT_TIMEOUT,
+    ):
+        self.chat_id = int(chat_id) if chat_id else None
+        self.digest_window = digest_window
+        self.timeout = timeout
+        self.client = None
+        self._queue = None
+        self._worker = None
+        self._pending = {}
+        self._window_ends = {}
+
+    def attach(self, client):
+        self.client = client
+
+    def notify(self, key, text, summary_line):
+        """Queue an alert; summary_line is used when it ends up in a digest"""
+        if self.client is None or self.chat_id is None:
+            logger.warning("Admin alerts are not configured, dropping alert")
+            return
+
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=MAX_PENDING_ALERTS)
+            self._worker = asyncio.ensure_future(self._run())
+
+        try:
+            self._queue.put_nowait((key, text, summary_line))
+        except asyncio.QueueFull:
+            logger.warning(f"Admin alert queue is full, dropping alert for {key}")
+
+    def notify_download(self, sender_info, file_name, size):
+        self.notify(
+            sender_info,
+            f"🚨 File Download Alert 🚨\nUser: {sender_info}\nFile: {file_name}\nSize: {size}",
+            f"• {file_name} ({size})",
+        )
+
+    def notify_album(self, sender_info, file_names, size):
+        shown = "\n".join(f"• {name}" for name in file_names[:MAX_DIGEST_LINES])
+        more = len(file_names) - MAX_DIGEST_LINES
+        if more > 0:
+            shown += f"\n…and {more} more"
+        self.notify(
+            sender_info,
+            f"🚨 Album Download Alert 🚨\nUser: {sender_info}\n"
+            f"Files: {len(file_names)} ({size})\n{shown}",
+            f"• Album of {len(file_names)} files ({size})",
+        )
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._window_ends:
+                timeout = max(min(self._window_ends.values()) - monotonic(), 0)
+
+            try:
+                key, text, summary_line = await asyncio.wait_for(
+                    self._queue.get(), timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+            else:
+                if key in self._window_ends:
+                    self._pending[key].append(summary_line)
+                else:
+                    self._open_window(key)
+                    await self._send(text)
+
+            await self._send_due_digests()
+
+    def _open_window(self, key):
+        self._window_ends[key] = monotonic() + self.digest_window
+        self._pending[key] = []
+
+    async def _send_due_digests(self, force=False):
+        now = monotonic()
+        for key, window_end in list(self._window_ends.items()):
+            if window_end > now and not force:
+                continue
+
+            lines = self._pending.pop(key)
+            del self._window_ends[key]
+            if not lines:
+                continue
+
+            await self._send(self._format_digest(key, lines))
+            if not force:
+                # Keep coalescing while the burst continues
+                self._open_window(key)
+
+    def _format_digest(self, key, lines):
+        shown = lines[:MAX_DIGEST_LINES]
+        more = len(lines) - len(shown)
+        text = (
+            f"🚨 File Download Alert 🚨\n"
+            f"{len(lines)} more file(s) from {key} in the last "
+            f"{self.digest_window:.0f}s:\n" + "\n".join(shown)
+        )
+        if more:
+            text += f"\n…and {more} more"
+        return text
+
+    async def _send(self, text):
+        try:
+            await asyncio.wait_for(
+                self.client.send_message(self.chat_id, text), self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out sending alert to admin after {self.timeout}s")
+        except Exception as e:
+            logger.error(f"Failed to send alert to admin: {str(e)}")
+
+    async def close(self):
+        """Stop the worker and send any digests that are still pending"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        while not self._queue.empty():
+            key, _, summary_line = self._queue.get_nowait()
+            self._pending.setdefault(key, []).append(summary_line)
+            self._window_ends.setdefault(key, 0)
+        await self._send_due_digests(force=True)
+
+
+admin_notifier = AdminNotifier()
+metrics.gauge(
+    "rpa_admin_alerts_pending",
+    "Admin alerts waiting to be sent",
+    lambda: admin_notifier._queue.qsize() if admin_notifier._queue else 0,
+)
@@ -0,0 +1,136 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+
+from config import DOWNLOAD_CONNECTIONS, DOWNLOAD_PART_SIZE
+from modules.disk_space import preallocate
+
+logger = logging.getLogger(__name__)
+
+# Telethon's largest upload.getFile request; part sizes are rounded to a multiple
+REQUEST_SIZE = 512 * 1024
+
+
+class ParallelDownloader:
+    """Downloads a document in fixed-size parts fetched concurrently.
+
+    Parts are written at their offsets into a file whose blocks are allocated
+    up front (fallocate where the filesystem supports it), and each
+    finished part is appended to a sidecar journal (``<file>.parts``). If the
+    bot restarts mid-download, the journal lets the next attempt skip parts
+    that are already on disk.
+    """
+
+    def __init__(
+        self, client, connections=DOWNLOAD_CONNECTIONS, part_size=DOWNLOAD_PART_SIZE
+    ):
+        self.client = client
+        self.connections = max(1, connections)
+        self.part_size = max(REQUEST_SIZE, part_size // REQUEST_SIZE * REQUEST_SIZE)
+
+    def _journal_header(self, document):
+        return {
+            "document_id": document.id,
+            "size": document.size,
+            "part_size": self.part_size,
+        }
+
+    def _load_journal(self, journal_path, document):
+        """Return the set of completed part indexes from a matching journal"""
+        try:
+            with open(journal_path, "r") as f:
+                header = json.loads(f.readline())
+                if header != self._journal_header(document):
+                    logger.info(f"Ignoring stale download journal {journal_path}")
+                    return None
+                # A partially written last line is simply ignored
+                return {int(line) for line in f if line.strip().isdigit()}
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError) as e:
+            logger.warning(f"Unreadable download journal {journal_path}: {str(e)}")
+            return None
+
+    async def download(self, document, file_path, progress_callback=None):
+        size = document.size
+        part_count = (size + self.part_size - 1) // self.part_size
+        journal_path = f"{file_path}.parts"
+
+        completed = self._load_journal(journal_path, document)
+        resuming = completed is not None and os.path.exists(file_path)
+        if not resuming:
+            completed = set()
+
+        loop = asyncio.get_running_loop()
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        journal = open(journal_path, "a" if resuming else "w")
+        try:
+            if os.fstat(fd).st_size != size:
+                await loop.run_in_executor(None, preallocate, fd, size)
+            if not resuming:
+                journal.write(json.dumps(self._journal_header(document)) + "\n")
+                journal.flush()
+            else:
+                logger.info(
+                    f"Resuming {file_path}: {len(completed)}/{part_count} parts already downloaded"
+                )
+
+            pending = asyncio.Queue()
+            for index in range(part_count):
+                if index not in completed:
+                    pending.put_nowait(index)
+
+            state = {"downloaded": sum(self._part_length(i, size) for i in completed)}
+            workers = [
+                asyncio.ensure_future(
+                    self._worker(
+                        document, fd, journal, pending, state, progress_callback
+                    )
+                )
+                for _ in range(min(self.connections, pending.qsize()))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+        finally:
+            os.close(fd)
+            journal.close()
+
+        os.remove(journal_path)
+        return file_path
+
+    def _part_length(self, index, size):
+        return min(self.part_size, size - index * self.part_size)
+
+    async def _worker(self, document, fd, journal, pending, state, progress_callback):
+        loop = asyncio.get_running_loop()
+        while not pending.empty():
+            index = pending.get_nowait()
+            offset = index * self.part_size
+            length = self._part_length(index, document.size)
+            limit = (length + REQUEST_SIZE - 1) // REQUEST_SIZE
+
+            async for chunk in self.client.iter_download(
+                document,
+                offset=offset,
+                request_size=REQUEST_SIZE,
+                limit=limit,
+                file_size=document.size,
+            ):
+                chunk = chunk[: length - (offset - index * self.part_size)]
+                await loop.run_in_executor(None, os.pwrite, fd, chunk, offset)
+                offset += len(chunk)
+                state["downloaded"] += len(chunk)
+                if progress_callback:
+                    result = progress_callback(state["downloaded"], document.size)
+                    if inspect.isawaitable(result):
+                        await result
+
+            journal.write(f"{index}\n")
+            journal.flush()
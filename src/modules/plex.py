@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+
+import aiohttp
+
+from config import (
+    DOWNLOAD_DIR,
+    PLEX_MEDIA_ROOT,
+    PLEX_SECTION_ID,
+    PLEX_TIMEOUT,
+    PLEX_TOKEN,
+    PLEX_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_sections(value):
+    """Parse PLEX_SECTION_ID: either one id for every folder or "movies:1,tv-shows:2" """
+    if not value:
+        return {}
+    if ":" not in value:
+        return {None: value.strip()}
+    sections = {}
+    for pair in value.split(","):
+        folder, _, section_id = pair.partition(":")
+        sections[folder.strip()] = section_id.strip()
+    return sections
+
+
+class PlexRefresher:
+    """Asks Plex to rescan just the folder a new file was published into.
+
+    Disabled unless PLEX_URL, PLEX_TOKEN and PLEX_SECTION_ID are set. Library
+    paths are translated from DOWNLOAD_DIR to PLEX_MEDIA_ROOT, the same
+    folder as Plex's own container sees it.
+    """
+
+    def __init__(
+        self,
+        url=PLEX_URL,
+        token=PLEX_TOKEN,
+        sections=PLEX_SECTION_ID,
+        media_root=PLEX_MEDIA_ROOT,
+        timeout=PLEX_TIMEOUT,
+    ):
+        self.url = url.rstrip("/") if url else None
+        self.token = token
+        self.sections = parse_sections(sections)
+        self.media_root = media_root or DOWNLOAD_DIR
+        self.timeout = timeout
+        self._session = None
+        self._tasks = set()
+
+    @property
+    def enabled(self):
+        return bool(self.url and self.token and self.sections)
+
+    def _section_for(self, relative_path):
+        top_folder = relative_path.split(os.sep, 1)[0]
+        return self.sections.get(top_folder, self.sections.get(None))
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def refresh(self, relative_path):
+        """Refresh the section folder containing relative_path (library-relative)"""
+        section_id = self._section_for(relative_path)
+        if not self.enabled or section_id is None:
+            return False
+        folder = os.path.join(self.media_root, os.path.dirname(relative_path))
+        try:
+            async with self._get_session().get(
+                f"{self.url}/library/sections/{section_id}/refresh",
+                params={"path": folder},
+                headers={"X-Plex-Token": self.token},
+            ) as response:
+                if response.status >= 400:
+                    logger.warning(
+                        f"Plex refresh of {folder} failed with HTTP {response.status}"
+                    )
+                    return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Plex refresh of {folder} failed: {str(e)}")
+            return False
+        logger.info(f"Asked Plex to refresh {folder}")
+        return True
+
+    def schedule(self, relative_path):
+        """Refresh in the background so a slow Plex never delays the reply"""
+        if not self.enabled:
+            return
+        task = asyncio.ensure_future(self.refresh(relative_path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+plex_refresher = PlexRefresher()
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import magic
+
+from config import (
+    DEDUP_HASH_CONTENT,
+    MEDIA_PROBE_ENABLED,
+    POST_PROCESS_MAX_PENDING,
+    POST_PROCESS_WORKERS,
+)
+from modules.dedup_index import hash_file
+from modules.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# One libmagic handle per worker process, created by the pool initializer
+_mime = None
+
+
+def _init_worker():
+    global _mime
+    _mime = magic.Magic(mime=True)
+
+
+def probe_media(path):
+    """Return basic container/stream details using ffprobe, if it is installed"""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+
+    completed = subprocess.run(
+        [
+            ffprobe,
+            "-v",
+            "quiet",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ],
+        capture_output=True,
+        timeout=120,
+    )
+    data = json.loads(completed.stdout or b"{}")
+    media_format = data.get("format", {})
+    video = next(
+        (s for s in data.get("streams", []) if s.get("codec_type") == "video"), {}
+    )
+    return {
+        "format": media_format.get("format_name"),
+        "duration": float(media_format.get("duration", 0) or 0),
+        "video_codec": video.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+    }
+
+
+def process_file(path, checksum, probe):
+    """Post-download work for one file; runs inside a worker process"""
+    os.chmod(path, 0o644)
+    result = {"mime_type": _mime.from_file(path)}
+    if checksum:
+        result["sha256"] = hash_file(path)
+    if probe:
+        try:
+            result["media_info"] = probe_media(path)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            result["media_info"] = None
+            result["probe_error"] = str(e)
+    return result
+
+
+class PostProcessPipeline:
+    """Runs MIME detection, checksums and media probing in a process pool.
+
+    At most ``max_pending`` files are in the pipeline at once; further
+    callers wait for a slot, so a burst of finished downloads cannot queue
+    unbounded work behind the pool.
+    """
+
+    def __init__(
+        self, workers=POST_PROCESS_WORKERS, max_pending=POST_PROCESS_MAX_PENDING
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = None
+        self.pending = 0
+
+    async def process(
+        self, path, checksum=DEDUP_HASH_CONTENT, probe=MEDIA_PROBE_ENABLED
+    ):
+        if self._executor is None:
+            # Forking would copy the event loop, client sockets and held locks
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        self.pending += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._executor, process_file, path, checksum, probe
+                )
+        finally:
+            self.pending -= 1
+
+        if "probe_error" in result:
+            logger.warning(f"Media probe failed for {path}: {result['probe_error']}")
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+post_processor = PostProcessPipeline()
+metrics.gauge(
+    "rpa_post_process_pending",
+    "Files waiting for or in post-processing",
+    lambda: post_processor.pending,
+)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from bisect import bisect_left
+from time import monotonic
+
+from config import PRODUCT_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+def get_cell(row, index, default=""):
+    return row[index] if index < len(row) else default
+
+
+class ProductCatalog:
+    """In-memory copy of one product sheet, indexed by product ID.
+
+    Reads are served from memory. Once the TTL has passed, the next read kicks
+    off a background refresh that only re-downloads the sheet if its Drive
+    revision has changed.
+    """
+
+    def __init__(self, gsheets, config, ttl=PRODUCT_CACHE_TTL):
+        self.gsheets = gsheets
+        self.workbook_id = config["workbook_id"]
+        self.product_data = config["product_data"]
+        self.columns = self.product_data["columns"]
+        self.ttl = ttl
+        self.products = {}
+        self.active_products = []
+        self.active_keys = []
+        self.revision = None
+        self.loaded_at = None
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    @property
+    def range_name(self):
+        return f"{self.product_data['worksheet_name']}!{self.product_data['range']}"
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def is_stale(self):
+        return not self.loaded or monotonic() - self.loaded_at > self.ttl
+
+    def is_active(self, row):
+        return get_cell(row, self.columns["active"]).upper() == "TRUE"
+
+    def _build_index(self, rows):
+        products = {}
+        active = []
+        product_id_col = self.columns["product_id"]
+        customer_col = self.columns["customer_name"]
+        for row in rows:
+            product_id = get_cell(row, product_id_col)
+            if not product_id:
+                continue
+            products[product_id] = row
+            if self.is_active(row):
+                key = get_cell(row, customer_col).strip().lower()
+                active.append((key, product_id, row))
+
+        # Sorted by customer name so a name prefix maps to one contiguous slice
+        active.sort(key=lambda item: (item[0], item[1]))
+        self.products = products
+        self.active_products = [row for _, _, row in active]
+        self.active_keys = [key for key, _, _ in active]
+
+    def active_range(self, prefix=""):
+        """Return the (start, end) slice of active products matching a customer prefix"""
+        if not prefix:
+            return 0, len(self.active_products)
+        prefix = prefix.strip().lower()
+        start = bisect_left(self.active_keys, prefix)
+        end = bisect_left(self.active_keys, prefix + "\uffff", lo=start)
+        return start, end
+
+    def page(self, offset, size, prefix=""):
+        """Return one page of active products and the total number of matches"""
+        start, end = self.active_range(prefix)
+        page_start = min(start + max(offset, 0), end)
+        return (
+            self.active_products[page_start : min(page_start + size, end)],
+            end - start,
+        )
+
+    async def refresh(self, force=False):
+        async with self._lock:
+            if not force and not self.is_stale():
+                return
+
+            revision = await self.gsheets.get_revision(self.workbook_id)
+            if (
+                not force
+                and self.loaded
+                and revision is not None
+                and revision == self.revision
+            ):
+                logger.info(f"Product catalog unchanged at revision {revision}")
+                self.loaded_at = monotonic()
+                return
+
+            rows = await self.gsheets.get_values(self.workbook_id, self.range_name)
+            self._build_index(rows)
+            self.revision = revision
+            self.loaded_at = monotonic()
+            logger.info(
+                f"Loaded {len(self.products)} products "
+                f"({len(self.active_products)} active) from {self.range_name}"
+            )
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Background product catalog refresh failed: {str(e)}")
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.refresh()
+        elif self.is_stale() and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.ensure_future(self._background_refresh())
+
+    def invalidate(self):
+        self.loaded_at = None
+        self.revision = None
+
+    def get_product(self, product_id):
+        return self.products.get(product_id)
+
+
+class ProductCatalogCache:
+    """Lazily creates one ProductCatalog per PAYMENT_CONFIGS entry"""
+
+    def __init__(self, plugins, configs):
+        self.plugins = plugins
+        self.configs = configs
+        self.catalogs = {}
+
+    async def get(self, config_key):
+        catalog = self.catalogs.get(config_key)
+        if catalog is None:
+            catalog = ProductCatalog(
+                await self.plugins.aget("google_sheets"), self.configs[config_key]
+            )
+            self.catalogs[config_key] = catalog
+        await catalog.ensure_loaded()
+        return catalog
+
+    def invalidate(self, config_key=None):
+        for key, catalog in self.catalogs.items():
+            if config_key is None or key == config_key:
+                catalog.invalidate()
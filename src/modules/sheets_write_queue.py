@@ -0,0 +1,110 @@
+import asyncio
+import logging
+
+from config import SHEETS_APPEND_MAX_BATCH, SHEETS_APPEND_WINDOW
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SheetsWriteQueue:
+    """Coalesces row appends per (workbook, worksheet) into batched requests.
+
+    The first append for a worksheet opens a short window; every append that
+    arrives before it closes is sent in the same values.append call, in the
+    order it was queued. Each caller awaits the outcome of its own batch.
+    Appends that insert new rows and appends that overwrite the empty rows
+    after the table are queued separately, so each keeps its own semantics.
+    """
+
+    def __init__(
+        self, sheets, window=SHEETS_APPEND_WINDOW, max_batch=SHEETS_APPEND_MAX_BATCH
+    ):
+        self.sheets = sheets
+        self.window = window
+        self.max_batch = max_batch
+        self._queues = {}
+        self._workers = {}
+        self._closing = False
+
+    def pending(self):
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def append(self, workbook_id, worksheet_name, values, insert_rows=True):
+        """Append a row; insert_rows=False writes over empty rows instead of
+        inserting, leaving formulas and ranges below the table where they are"""
+        if self._closing:
+            raise Exception("Sheets write queue is shutting down")
+
+        key = (workbook_id, worksheet_name, insert_rows)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[key] = queue
+            self._workers[key] = asyncio.ensure_future(self._worker(key, queue))
+
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((values, future))
+        return await future
+
+    async def _worker(self, key, queue):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(key, batch)
+
+    async def _flush(self, key, batch):
+        workbook_id, worksheet_name, insert_rows = key
+        try:
+            request = (
+                self.sheets.service.spreadsheets()
+                .values()
+                .append(
+                    spreadsheetId=workbook_id,
+                    range=f"{worksheet_name}!{'A1' if insert_rows else 'A:A'}",
+                    valueInputOption="USER_ENTERED",
+                    insertDataOption="INSERT_ROWS" if insert_rows else "OVERWRITE",
+                    body={"values": [values for values, _ in batch]},
+                )
+            )
+            result = await self.sheets.transport.execute(request)
+            logger.info(f"Appended {len(batch)} row(s) to {worksheet_name}")
+        except Exception as e:
+            logger.error(f"Failed to append {len(batch)} row(s): {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Flush every pending append and stop the workers"""
+        self._closing = True
+        for queue in self._queues.values():
+            queue.put_nowait(_STOP)
+        if self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        logger.info("Sheets write queue flushed")
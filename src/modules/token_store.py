@@ -0,0 +1,165 @@
+import asyncio
+import errno
+import fcntl
+import json
+import logging
+import os
+from time import time
+
+from config import ZOHO_TOKEN_FILE, ZOHO_TOKEN_LEGACY_FILE, ZOHO_TOKEN_SAVE_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """OAuth tokens held in memory and persisted to a JSON file off the loop.
+
+    Writes go to a temporary file that is fsynced and renamed over the token
+    file, so a crash never leaves it half written. Updates arriving within
+    ZOHO_TOKEN_SAVE_DELAY of each other are saved once. Reads and writes hold
+    an flock on "<file>.lock", so several bot processes can share the file.
+    If the token file does not exist yet, tokens are copied over once from
+    legacy_path, where older releases kept them.
+    """
+
+    def __init__(
+        self,
+        path=ZOHO_TOKEN_FILE,
+        save_delay=ZOHO_TOKEN_SAVE_DELAY,
+        legacy_path=ZOHO_TOKEN_LEGACY_FILE,
+    ):
+        self.path = path
+        self.save_delay = save_delay
+        self.legacy_path = legacy_path
+        self.tokens = {}
+        self.loaded = False
+        self._load_lock = None
+        self._save_task = None
+        self._dirty = False
+
+    def get(self, key):
+        return self.tokens.get(key)
+
+    def _locked(self, mode):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(f"{self.path}.lock", "a")
+        fcntl.flock(lock_file, mode)
+        return lock_file
+
+    def _read(self):
+        with self._locked(fcntl.LOCK_SH):
+            try:
+                with open(self.path) as f:
+                    content = f.read()
+            except FileNotFoundError:
+                return None
+        if not content.strip():
+            return {}
+        return json.loads(content)
+
+    def _write(self, content):
+        with self._locked(fcntl.LOCK_EX):
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+                # The token file itself is a bind mount and cannot be renamed over
+                os.remove(tmp_path)
+                logger.warning(
+                    f"Cannot replace {self.path} atomically, writing it in place"
+                )
+                with open(self.path, "w") as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _migrate_legacy(self):
+        """Copy tokens from legacy_path to path, returning them, or None"""
+        if not self.legacy_path or os.path.abspath(self.legacy_path) == os.path.abspath(
+            self.path
+        ):
+            return None
+        try:
+            with open(self.legacy_path) as f:
+                tokens = json.loads(f.read() or "{}")
+        # A bind mount of a missing host file shows up as a directory
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+        if not tokens.get("access_token") and not tokens.get("refresh_token"):
+            return None
+        self._write(json.dumps(tokens))
+        logger.info(f"Migrated Zoho tokens from {self.legacy_path} to {self.path}")
+        return tokens
+
+    async def read_file(self):
+        """Read the token file without touching the in-memory tokens"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read)
+
+    async def load(self):
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self.loaded:
+                return self.tokens
+            try:
+                tokens = await self.read_file()
+                if tokens is None:
+                    loop = asyncio.get_running_loop()
+                    tokens = await loop.run_in_executor(None, self._migrate_legacy)
+            except json.JSONDecodeError:
+                logger.warning("Token file is invalid. Proceeding without tokens.")
+                tokens = {}
+            except Exception as e:
+                logger.error(f"Unexpected error loading tokens: {str(e)}")
+                tokens = {}
+
+            if tokens is None:
+                logger.warning(
+                    f"Token file {self.path} not found. Proceeding without tokens."
+                )
+            elif tokens.get("access_token"):
+                expires_at = tokens.get("expires_at")
+                expiry = (
+                    f", access token expires in {int(expires_at - time())}s"
+                    if expires_at
+                    else ""
+                )
+                has_refresh = "with" if tokens.get("refresh_token") else "without"
+                logger.info(f"Loaded Zoho tokens {has_refresh} refresh token{expiry}")
+            else:
+                logger.warning("Token file exists but doesn't contain valid tokens.")
+
+            self.tokens = tokens or {}
+            self.loaded = True
+            return self.tokens
+
+    def update(self, **tokens):
+        """Replace tokens in memory and schedule a coalesced save"""
+        self.tokens.update({k: v for k, v in tokens.items() if v is not None})
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_loop())
+
+    async def _save_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            await asyncio.sleep(self.save_delay)
+            self._dirty = False
+            content = json.dumps(self.tokens)
+            try:
+                await loop.run_in_executor(None, self._write, content)
+                logger.info("Saved Zoho tokens")
+            except Exception as e:
+                logger.error(f"Failed to save Zoho tokens: {str(e)}")
+
+    async def flush(self):
+        if self._save_task is not None and not self._save_task.done():
+            await self._save_task
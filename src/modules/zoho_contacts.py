@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from bisect import bisect_left
+from time import monotonic
+
+from config import ZOHO_CONTACTS_FULL_SYNC, ZOHO_CONTACTS_TTL
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ("contact_name", "company_name", "email", "phone")
+PAGE_SIZE = 200
+# Substring searches are answered from an index of every 3-character slice
+GRAM = 3
+
+
+def grams(text):
+    return {text[i : i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class ContactDirectory:
+    """Local mirror of the Zoho Books contact list with a search index.
+
+    The first use downloads every page of /contacts. After ZOHO_CONTACTS_TTL
+    the next read starts a background refresh that only pulls contacts
+    modified since the newest one we have; a full resync every
+    ZOHO_CONTACTS_FULL_SYNC seconds also drops contacts deleted in Zoho.
+    """
+
+    def __init__(self, zoho, ttl=ZOHO_CONTACTS_TTL, full_sync=ZOHO_CONTACTS_FULL_SYNC):
+        self.zoho = zoho
+        self.ttl = ttl
+        self.full_sync = full_sync
+        self.contacts = {}
+        self.last_modified = ""
+        self.refreshed_at = None
+        self.full_synced_at = None
+        self._sorted = {field: [] for field in SEARCH_FIELDS}
+        self._grams = {field: {} for field in SEARCH_FIELDS}
+        self._lock = None
+        self._refresh_task = None
+
+    @staticmethod
+    def supports(query):
+        """True if every filter in query can be answered from the local index"""
+        for key in query:
+            field = (
+                key.rsplit("_", 1)[0]
+                if key.endswith(("_startswith", "_contains"))
+                else key
+            )
+            if field not in SEARCH_FIELDS and key != "search_text":
+                return False
+        return True
+
+    async def _fetch(self, params, stop_at=None):
+        contacts = []
+        page = 1
+        while True:
+            data = await self.zoho._request(
+                "GET",
+                "/contacts",
+                params={**params, "page": page, "per_page": PAGE_SIZE},
+            )
+            for contact in data.get("contacts", []):
+                if stop_at and contact.get("last_modified_time", "") <= stop_at:
+                    return contacts
+                contacts.append(contact)
+            if not data.get("page_context", {}).get("has_more_page"):
+                return contacts
+            page += 1
+
+    async def refresh(self, full=False, initial=False):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if initial and self.refreshed_at is not None:
+                # Another caller finished the first load while we waited
+                return
+            full = (
+                full
+                or self.full_synced_at is None
+                or monotonic() - self.full_synced_at > self.full_sync
+            )
+            if full:
+                contacts = await self._fetch({"sort_column": "contact_name"})
+                self.contacts = {}
+            else:
+                contacts = await self._fetch(
+                    {"sort_column": "last_modified_time", "sort_order": "D"},
+                    stop_at=self.last_modified,
+                )
+
+            for contact in contacts:
+                self.contacts[contact["contact_id"]] = contact
+                self.last_modified = max(
+                    self.last_modified, contact.get("last_modified_time", "")
+                )
+            self._build_index()
+
+            self.refreshed_at = monotonic()
+            if full:
+                self.full_synced_at = self.refreshed_at
+            logger.info(
+                f"{'Synced' if full else 'Updated'} Zoho contacts: "
+                f"{len(contacts)} fetched, {len(self.contacts)} cached"
+            )
+
+    def _build_index(self):
+        for field in SEARCH_FIELDS:
+            self._sorted[field] = sorted(
+                (str(contact.get(field) or "").lower(), contact_id)
+                for contact_id, contact in self.contacts.items()
+                if contact.get(field)
+            )
+            index = {}
+            for value, contact_id in self._sorted[field]:
+                for gram in grams(value):
+                    index.setdefault(gram, set()).add(contact_id)
+            self._grams[field] = index
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Background Zoho contact refresh failed: {str(e)}")
+
+    async def ensure_fresh(self):
+        if self.refreshed_at is None:
+            await self.refresh(full=True, initial=True)
+        elif monotonic() - self.refreshed_at > self.ttl and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.ensure_future(self._background_refresh())
+
+    def _startswith(self, field, prefix):
+        entries = self._sorted[field]
+        start = bisect_left(entries, (prefix,))
+        end = bisect_left(entries, (prefix + "\uffff",), lo=start)
+        return {contact_id for _, contact_id in entries[start:end]}
+
+    def _contains(self, field, text):
+        if len(text) < GRAM:
+            return {
+                contact_id for value, contact_id in self._sorted[field] if text in value
+            }
+        # Contacts holding every slice of text, smallest posting list first
+        postings = sorted(
+            (self._grams[field].get(gram, set()) for gram in grams(text)), key=len
+        )
+        candidates = set.intersection(*postings)
+        return {
+            contact_id
+            for contact_id in candidates
+            if text in str(self.contacts[contact_id].get(field) or "").lower()
+        }
+
+    def search(self, **query):
+        """Answer a get_customers style query from the local index"""
+        matches = None
+        for key, value in query.items():
+            value = str(value).lower()
+            if key == "search_text":
+                found = set()
+                for field in SEARCH_FIELDS:
+                    found |= self._contains(field, value)
+            elif key.endswith("_startswith"):
+                found = self._startswith(key[: -len("_startswith")], value)
+            elif key.endswith("_contains"):
+                found = self._contains(key[: -len("_contains")], value)
+            else:
+                found = {
+                    contact_id
+                    for contact_id in self._startswith(key, value)
+                    if str(self.contacts[contact_id].get(key) or "").lower() == value
+                }
+            matches = found if matches is None else matches & found
+
+        if matches is None:
+            matches = self.contacts.keys()
+        return sorted(
+            (self.contacts[contact_id] for contact_id in matches),
+            key=lambda contact: str(contact.get("contact_name") or "").lower(),
+        )
@@ -1,22 +1,43 @@
-from config import ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, ZOHO_ORGANIZATION_ID
-import requests
+from config import (
+    ZOHO_CLIENT_ID,
+    ZOHO_CLIENT_SECRET,
+    ZOHO_ORGANIZATION_ID,
+    ZOHO_TIMEOUT,
+    ZOHO_MAX_CONNECTIONS,
+)
+from modules.metrics import metrics
+from modules.token_store import TokenStore
+from modules.zoho_contacts import ContactDirectory
+from time import time
+import aiohttp
+import asyncio
 import logging
-import json
-import os
 
 logger = logging.getLogger(__name__)
 
+TOKEN_URL = "https://accounts.zoho.com/oauth/v2/token"
+# Refresh this many seconds before the access token actually expires
+TOKEN_REFRESH_MARGIN = 300
+
+
+class ZohoApiError(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"Zoho API error {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
 
 class ZohoInvoicing:
     def __init__(self):
         self.client_id = ZOHO_CLIENT_ID
         self.client_secret = ZOHO_CLIENT_SECRET
         self.redirect_uri = "https://example.com/oauth/callback"
-        self.access_token = None
-        self.refresh_token = None
         self.organization_id = ZOHO_ORGANIZATION_ID
         self.base_url = "https://www.zohoapis.com/books/v3"
-        self.load_tokens()
+        self._session = None
+        self._refresh_lock = None
+        self.contact_directory = ContactDirectory(self)
+        self.token_store = TokenStore()
 
     def generate_auth_url(self):
         return (
@@ -28,54 +49,70 @@ class ZohoInvoicing:
             f"access_type=offline"
         )
 
-    def save_tokens(self):
-        logger.info(f"Saving tokens..")
-        tokens = {"access_token": self.access_token}
-        if self.refresh_token:
-            tokens["refresh_token"] = self.refresh_token
-        with open("zoho_tokens.json", "w") as f:
-            json.dump(tokens, f)
-
-    def load_tokens(self):
-        token_file = "zoho_tokens.json"
-        if not os.path.exists(token_file):
-            logger.warning(
-                f"Token file {token_file} not found. Proceeding without tokens."
-            )
-            self.access_token = None
-            self.refresh_token = None
-            return
+    @property
+    def access_token(self):
+        return self.token_store.get("access_token")
+
+    @property
+    def refresh_token(self):
+        return self.token_store.get("refresh_token")
+
+    @property
+    def token_expires_at(self):
+        return self.token_store.get("expires_at")
 
+    async def load_tokens(self):
+        await self.token_store.load()
+
+    async def adopt_saved_tokens(self, stale_token):
+        """Use tokens another bot process refreshed, if the file has newer ones"""
         try:
-            with open(token_file, "r") as f:
-                tokens = json.load(f)
-            self.access_token = tokens.get("access_token")
-            self.refresh_token = tokens.get("refresh_token")
-            if self.access_token and self.refresh_token:
-                logger.info(
-                    f"Loaded tokens: access_token={self.access_token}, refresh_token={self.refresh_token}"
-                )
-            elif self.access_token:
-                logger.info(f"Loaded access token: {self.access_token}")
-            else:
-                logger.warning("Token file exists but doesn't contain valid tokens.")
-        except FileNotFoundError:
-            logger.warning(
-                f"Token file {token_file} not found. Proceeding without tokens."
-            )
-            self.access_token = None
-            self.refresh_token = None
-        except json.JSONDecodeError:
-            logger.warning("Token file is empty or invalid. Proceeding without tokens.")
-            self.access_token = None
-            self.refresh_token = None
+            tokens = await self.token_store.read_file() or {}
         except Exception as e:
-            logger.error(f"Unexpected error loading tokens: {str(e)}")
-            self.access_token = None
-            self.refresh_token = None
+            logger.error(f"Could not re-read Zoho tokens: {str(e)}")
+            return False
+        access_token = tokens.get("access_token")
+        expires_at = tokens.get("expires_at")
+        if (
+            not access_token
+            or access_token == stale_token
+            or (expires_at and time() >= expires_at - TOKEN_REFRESH_MARGIN)
+        ):
+            return False
+        self.token_store.tokens.update(tokens)
+        logger.info("Using Zoho access token refreshed by another process")
+        return True
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=ZOHO_MAX_CONNECTIONS, keepalive_timeout=60
+                ),
+                timeout=aiohttp.ClientTimeout(total=ZOHO_TIMEOUT),
+            )
+        return self._session
+
+    def _apply_token_response(self, tokens):
+        self.token_store.update(
+            access_token=tokens["access_token"],
+            refresh_token=tokens.get("refresh_token"),
+            expires_at=time() + int(tokens.get("expires_in", 3600)),
+        )
+
+    async def _post_token_request(self, data):
+        # Load first so the saved tokens cannot overwrite the new ones later
+        await self.load_tokens()
+        session = self._get_session()
+        async with session.post(TOKEN_URL, data=data) as response:
+            tokens = await response.json(content_type=None)
+            if response.status == 200 and "access_token" in tokens:
+                self._apply_token_response(tokens)
+                return True
+            logger.error(f"Zoho token request failed: {tokens.get('error', tokens)}")
+            return False
 
     async def get_tokens(self, authorization_code):
-        url = "https://accounts.zoho.com/oauth/v2/token"
         data = {
             "code": authorization_code,
             "client_id": self.client_id,
@@ -83,81 +120,136 @@ class ZohoInvoicing:
             "redirect_uri": self.redirect_uri,
             "grant_type": "authorization_code",
         }
-        response = requests.post(url, data=data)
-        if response.status_code == 200:
-            tokens = response.json()
-            self.access_token = tokens["access_token"]
-            self.refresh_token = tokens.get("refresh_token")  # Use get() method
-            self.save_tokens()
-            return True
-        else:
-            logger.error(f"Failed to get tokens: {response.text}")
+        try:
+            return await self._post_token_request(data)
+        except Exception as e:
+            logger.error(f"Failed to get tokens: {str(e)}")
             return False
 
-    async def refresh_access_token(self):
+    async def refresh_access_token(self, stale_token=None):
+        """Refresh the access token, sharing one request between concurrent callers.
+
+        Callers pass the token they saw as invalid; if another caller already
+        replaced it while this one waited for the lock, no new request is made.
+        """
+        await self.load_tokens()
         if not self.refresh_token:
             logger.error("No refresh token available")
             return False
 
-        url = "https://accounts.zoho.com/oauth/v2/token"
-        data = {
-            "refresh_token": self.refresh_token,
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "grant_type": "refresh_token",
-        }
-        response = requests.post(url, data=data)
-        if response.status_code == 200:
-            self.access_token = response.json()["access_token"]
-            self.save_tokens()
-            return True
-        else:
-            logger.error(f"Failed to refresh access token: {response.text}")
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        async with self._refresh_lock:
+            if (
+                self.access_token
+                and self.access_token != stale_token
+                and not self.token_expiring()
+            ):
+                return True
+            if await self.adopt_saved_tokens(stale_token):
+                return True
+
+            data = {
+                "refresh_token": self.refresh_token,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type": "refresh_token",
+            }
+            try:
+                refreshed = await self._post_token_request(data)
+            except Exception as e:
+                logger.error(f"Failed to refresh access token: {str(e)}")
+                return False
+            if refreshed:
+                logger.info("Zoho access token refreshed")
+            return refreshed
+
+    def token_expiring(self):
+        # Tokens saved before expiry tracking existed are trusted until a 401
+        if self.token_expires_at is None:
             return False
+        return time() >= self.token_expires_at - TOKEN_REFRESH_MARGIN
 
     async def ensure_valid_token(self):
+        await self.load_tokens()
         if not self.tokens_available():
             logger.error("No tokens available.")
             return False
-        if not self.access_token:
-            logger.info("Access token not available, attempting to refresh.")
-            if not await self.refresh_access_token():
+        if not self.access_token or self.token_expiring():
+            logger.info("Access token missing or about to expire, refreshing.")
+            if not await self.refresh_access_token(stale_token=self.access_token):
                 logger.error("Failed to refresh access token.")
                 return False
-        logger.info("Access token is available and valid.")
         return True
 
-    async def create_invoice(self, customer_id, items):
+    async def _request(self, method, path, params=None, **kwargs):
+        """Call the Books API, refreshing and retrying once if the token is rejected"""
+        with metrics.track("zoho"):
+            return await self._send_request(method, path, params, **kwargs)
+
+    async def _send_request(self, method, path, params=None, **kwargs):
         if not await self.ensure_valid_token():
-            return None
+            raise ZohoApiError(401, "No valid Zoho access token")
+
+        params = {"organization_id": self.organization_id, **(params or {})}
+        session = self._get_session()
+        for attempt in range(2):
+            token = self.access_token
+            headers = {"Authorization": f"Zoho-oauthtoken {token}"}
+            async with session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=headers,
+                params=params,
+                **kwargs,
+            ) as response:
+                if response.status == 401 and attempt == 0:
+                    logger.info("Zoho rejected the access token, refreshing.")
+                    if await self.refresh_access_token(stale_token=token):
+                        continue
 
+                data = await response.json(content_type=None)
+                if response.status >= 400:
+                    raise ZohoApiError(
+                        response.status,
+                        data.get("message", "unknown error"),
+                        retry_after=response.headers.get("Retry-After"),
+                    )
+                return data
+
+    async def submit_invoice(self, invoice):
+        """Create an invoice, raising ZohoApiError instead of returning None"""
+        data = await self._request("POST", "/invoices", json=invoice)
+        return data.get("invoice", {})
+
+    async def find_invoice(self, reference_number):
+        data = await self._request(
+            "GET", "/invoices", params={"reference_number": reference_number}
+        )
+        for invoice in data.get("invoices", []):
+            if invoice.get("reference_number") == reference_number:
+                return invoice
+        return None
+
+    async def create_invoice(self, customer_id, items):
         try:
-            url = f"{self.base_url}/invoices"
-            headers = {
-                "Authorization": f"Zoho-oauthtoken {self.access_token}",
-                "Content-Type": "application/json",
-            }
             data = {"customer_id": customer_id, "line_items": items}
-            response = requests.post(url, headers=headers, json=data)
-            if response.status_code == 201:
-                return response.json()
-            else:
-                logger.error(f"Error creating invoice: {response.text}")
-                return None
+            return await self._request("POST", "/invoices", json=data)
         except Exception as e:
             logger.error(f"Error creating invoice: {str(e)}")
             return None
 
     async def get_customers(self, **kwargs):
-        if not await self.ensure_valid_token():
-            logger.error("Failed to ensure valid token.")
-            return None
+        if ContactDirectory.supports(kwargs):
+            try:
+                await self.contact_directory.ensure_fresh()
+                return self.contact_directory.search(**kwargs)
+            except Exception as e:
+                logger.error(f"Contact directory unavailable, querying Zoho: {str(e)}")
 
         try:
-            base_url = f"{self.base_url}/contacts"
-            params = {
-                "organization_id": self.organization_id,
-            }
+            params = {}
 
             valid_params = [
                 "contact_name",
@@ -194,22 +286,19 @@ class ZohoInvoicing:
                 if f"{param}_contains" in kwargs:
                     params[f"{param}_contains"] = kwargs[f"{param}_contains"]
 
-            headers = {"Authorization": f"Zoho-oauthtoken {self.access_token}"}
-            response = requests.get(base_url, headers=headers, params=params)
-            logging.info(f"API response: {response}")  # Log the raw API response
-
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(
-                    f"Successfully fetched {len(data.get('contacts', []))} customers"
-                )
-                return data.get("contacts", [])
-            else:
-                logger.error(f"Error fetching customers: {response.text}")
-                return None
+            data = await self._request("GET", "/contacts", params=params)
+            logger.info(
+                f"Successfully fetched {len(data.get('contacts', []))} customers"
+            )
+            return data.get("contacts", [])
         except Exception as e:
             logger.error(f"Error fetching customers: {str(e)}")
             return None
 
     def tokens_available(self):
         return self.access_token is not None and self.refresh_token is not None
+
+    async def close(self):
+        await self.token_store.flush()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
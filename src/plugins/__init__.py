@@ -1,14 +1,125 @@
+import asyncio
 import importlib
-import os
+import logging
+import threading
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+# Plugin name -> module providing setup(). Nothing is imported until first use.
+PLUGIN_MANIFEST = {
+    "google_sheets": "plugins.google_sheets",
+    "zoho_invoicing": "plugins.zoho_invoicing",
+}
+
+
+class PluginRegistry:
+    """Plugins from the manifest, imported and set up on their first get().
+
+    Only plugins that have been loaded show up in items(), so shutdown does
+    not create a plugin just to close it. Handlers use aget(), which does the
+    import and the plugin's blocking warm() in an executor; warm() starts
+    that for every plugin once the bot is up, so first use does not wait.
+    """
+
+    def __init__(self, manifest=PLUGIN_MANIFEST):
+        self.manifest = dict(manifest)
+        self.instances = {}
+        self.load_times = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._loads = {}
+
+    def get(self, name, default=None):
+        plugin = self.instances.get(name)
+        if plugin is not None:
+            return plugin
+        if name not in self.manifest or name in self.errors:
+            return default
+
+        with self._lock:
+            if name in self.instances:
+                return self.instances[name]
+            return self._setup(name, default, perf_counter())
+
+    def _setup(self, name, default, started):
+        try:
+            module = importlib.import_module(self.manifest[name])
+            plugin = module.setup()
+        except Exception as e:
+            logger.error(f"Failed to load plugin {name}: {str(e)}")
+            self.errors[name] = str(e)
+            return default
+        self.load_times[name] = perf_counter() - started
+        self.instances[name] = plugin
+        logger.info(f"Loaded plugin {name} in {self.load_times[name] * 1000:.0f} ms")
+        return plugin
+
+    async def _load(self, name):
+        loop = asyncio.get_running_loop()
+        started = perf_counter()
+        # Only the import runs in a thread; setup() may create asyncio objects,
+        # which need the loop's thread on Python 3.9
+        try:
+            await loop.run_in_executor(
+                None, importlib.import_module, self.manifest[name]
+            )
+        except Exception:
+            pass  # _setup imports again and records the error
+        plugin = self.instances.get(name)
+        if plugin is None and name not in self.errors:
+            with self._lock:
+                plugin = self.instances.get(name) or self._setup(name, None, started)
+        warm = getattr(plugin, "warm", None)
+        if warm is not None:
+            try:
+                await loop.run_in_executor(None, warm)
+            except Exception as e:
+                # The plugin reports the same error when it is used
+                logger.warning(f"Failed to warm up plugin {name}: {str(e)}")
+        return plugin
+
+    def _load_task(self, name):
+        task = self._loads.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._load(name))
+            self._loads[name] = task
+        return task
+
+    async def aget(self, name, default=None):
+        """get() without blocking the event loop on the first load"""
+        if name not in self.manifest:
+            return default
+        # Shielded so a cancelled handler does not abort the shared load
+        plugin = await asyncio.shield(self._load_task(name))
+        return default if plugin is None else plugin
+
+    def warm(self):
+        """Start loading every plugin in the background"""
+        for name in self.manifest:
+            self._load_task(name)
+
+    def __contains__(self, name):
+        return name in self.manifest
+
+    def items(self):
+        return list(self.instances.items())
+
+    def report(self):
+        lines = []
+        for name in self.manifest:
+            if name in self.load_times:
+                lines.append(f"{name}: loaded in {self.load_times[name] * 1000:.0f} ms")
+            elif name in self.errors:
+                lines.append(f"{name}: failed ({self.errors[name]})")
+            else:
+                lines.append(f"{name}: not loaded yet")
+        return lines
 
 
 def load_plugins():
-    plugins = {}
-    plugin_dir = os.path.dirname(__file__)
-    for filename in os.listdir(plugin_dir):
-        if filename.endswith(".py") and not filename.startswith("__"):
-            module_name = filename[:-3]
-            module = importlib.import_module(f"plugins.{module_name}")
-            if hasattr(module, "setup"):
-                plugins[module_name] = module.setup()
+    plugins = PluginRegistry()
+    logger.info(
+        f"Registered plugins: {', '.join(plugins.manifest)} (loaded on first use)"
+    )
     return plugins
@@ -1,13 +1,17 @@
 from typing import List
 from modules.google_sheets import GoogleSheetsModule
-import logging
-from functools import partial
+from utils.helpers import column_letter
 import asyncio
+import logging
 
 logger = logging.getLogger(__name__)
 
 
 class EnhancedGoogleSheetsModule(GoogleSheetsModule):
+    def __init__(self):
+        super().__init__()
+        self.row_locks = {}
+
     async def get_values(self, workbook_id: str, range_name: str) -> List[List[str]]:
         """Fetch values from a specific range"""
         try:
@@ -17,48 +21,60 @@ class EnhancedGoogleSheetsModule(GoogleSheetsModule):
                 .values()
                 .get(spreadsheetId=workbook_id, range=range_name)
             )
-            # Execute in thread pool
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, request.execute)
+            result = await self.transport.execute(request)
             return result.get("values", [])
         except Exception as e:
             logger.error(f"Error fetching values: {str(e)}")
             raise
 
+    async def _next_free_row(self, workbook_id, worksheet_name, columns):
+        """Find the first row after the last value in the given columns"""
+        first, last = column_letter(min(columns)), column_letter(max(columns))
+        request = (
+            self.service.spreadsheets()
+            .values()
+            .get(spreadsheetId=workbook_id, range=f"{worksheet_name}!{first}:{last}")
+        )
+        result = await self.transport.execute(request)
+        return len(result.get("values", [])) + 1
+
     async def append_sparse_row(self, workbook_id, worksheet_name, values_dict):
         """
         Append a row with values only in specific columns, preserving formulas in other columns.
 
+        The next free row is read from the sheet every time, since rows can be
+        added by hand or by other writers, and all cells are then written in a
+        single values.batchUpdate. Appends to one worksheet are serialized.
+
         Args:
             workbook_id (str): The ID of the workbook
             worksheet_name (str): The name of the worksheet
             values_dict (dict): Dictionary mapping column indices to values
         """
+        key = (workbook_id, worksheet_name)
+        lock = self.row_locks.setdefault(key, asyncio.Lock())
         try:
-            # Get the worksheet
-            worksheet = await self.get_worksheet(workbook_id, worksheet_name)
-
-            # Create the request body
-            request_body = {"values": [[""]]}  # Start with an empty row
-
-            # Create a range that specifies just the columns we want to update
-            ranges = []
-            for col_index, value in values_dict.items():
-                col_letter = chr(
-                    65 + col_index
-                )  # Convert number to letter (0=A, 1=B, etc.)
-                next_row = len(worksheet.get("values", [])) + 1
-                cell_range = f"{worksheet_name}!{col_letter}{next_row}"
-
-                # Update the specific cell
-                await self.service.spreadsheets().values().update(
-                    spreadsheetId=workbook_id,
-                    range=cell_range,
-                    valueInputOption="USER_ENTERED",
-                    body={"values": [[value]]},
-                ).execute()
-
-            return True
+            async with lock:
+                next_row = await self._next_free_row(
+                    workbook_id, worksheet_name, values_dict.keys()
+                )
+                data = [
+                    {
+                        "range": f"{worksheet_name}!{column_letter(col_index)}{next_row}",
+                        "values": [[value]],
+                    }
+                    for col_index, value in sorted(values_dict.items())
+                ]
+                request = (
+                    self.service.spreadsheets()
+                    .values()
+                    .batchUpdate(
+                        spreadsheetId=workbook_id,
+                        body={"valueInputOption": "USER_ENTERED", "data": data},
+                    )
+                )
+                await self.transport.execute(request)
+                return True
 
         except Exception as e:
             logger.error(f"Error appending sparse row: {str(e)}")
@@ -69,23 +85,7 @@ class EnhancedGoogleSheetsModule(GoogleSheetsModule):
     ):
         """Append a row to a specific worksheet"""
         try:
-            body = {"values": [values]}
-            # Create the request
-            request = (
-                self.service.spreadsheets()
-                .values()
-                .append(
-                    spreadsheetId=workbook_id,
-                    range=f"{worksheet_name}!A1",
-                    valueInputOption="USER_ENTERED",
-                    insertDataOption="INSERT_ROWS",
-                    body=body,
-                )
-            )
-            # Execute in thread pool
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, request.execute)
-            return result
+            return await self.write_queue.append(workbook_id, worksheet_name, values)
         except Exception as e:
             logger.error(f"Error appending row: {str(e)}")
             raise
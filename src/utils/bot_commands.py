@@ -3,6 +3,30 @@ COMMANDS = {
         "description": "Show all available commands",
         "roles": ["guest", "user", "admin"],
     },
+    "queue": {
+        "description": "Show running and queued downloads",
+        "roles": ["guest", "user", "admin"],
+    },
+    "cancel_download": {
+        "description": "Cancel a running or queued download by id",
+        "roles": ["guest", "user", "admin"],
+    },
+    "reorganize": {
+        "description": "Preview moving existing downloads to the current naming scheme (add 'apply' to move them)",
+        "roles": ["admin"],
+    },
+    "stats": {
+        "description": "Show latency, error and queue statistics",
+        "roles": ["admin"],
+    },
+    "disk": {
+        "description": "Show free space and the download space reservations",
+        "roles": ["admin"],
+    },
+    "dedup_scan": {
+        "description": "Index existing downloads for duplicate detection (add 'hash' to checksum files)",
+        "roles": ["admin"],
+    },
     # "zoho_auth": {
     #     "description": "Authorize the bot to use Zoho Books",
     #     "roles": ["admin"],
@@ -32,7 +56,15 @@ COMMANDS = {
         "roles": ["admin"],
     },
     "record_payment": {
-        "description": "Record a new payment received for a product",
+        "description": "Record a new payment received for a product (optionally filter by customer name)",
+        "roles": ["admin"],
+    },
+    "refresh_products": {
+        "description": "Reload the product catalog from Google Sheets",
+        "roles": ["admin"],
+    },
+    "bulk_invoice": {
+        "description": "Invoice every active product in Zoho Books for a month (YYYY-MM, default this month)",
         "roles": ["admin"],
     },
 }
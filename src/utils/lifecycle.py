@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from telethon.errors import FloodWaitError
+from config import BOT_TOKEN
+from modules.metrics import metrics
+from modules.notifier import admin_notifier
+from modules.plex import plex_refresher
+from modules.post_process import post_processor
+
+logger = logging.getLogger(__name__)
+
+
+async def start_client(client):
+    while True:
+        try:
+            await client.start(bot_token=BOT_TOKEN)
+            logger.info("Bot started successfully")
+            return
+        except FloodWaitError as e:
+            wait_time = e.seconds
+            logger.warning(
+                f"Rate limited. Waiting {wait_time} seconds before retrying..."
+            )
+            await asyncio.sleep(wait_time)
+        except Exception as e:
+            logger.error(f"Failed to start bot: {str(e)}")
+            raise
+
+
+async def close_plugins(plugins):
+    for name, plugin in plugins.items():
+        if hasattr(plugin, "close"):
+            try:
+                await plugin.close()
+            except Exception as e:
+                logger.error(f"Error closing plugin {name}: {str(e)}")
+
+
+async def shutdown(client, plugins):
+    await admin_notifier.close()
+    await client.disconnect()
+    await close_plugins(plugins)
+    post_processor.shutdown()
+    await plex_refresher.close()
+    await metrics.close()
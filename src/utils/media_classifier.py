@@ -0,0 +1,111 @@
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# The rules get_dynamic_path has always applied (quality tag, SxxEyy, a year
+# set off by brackets or spaces, any four digits), folded into one pattern.
+# Each rule is an optional lookahead anchored at the start, which finds the
+# same first occurrence re.search would, so one match() call extracts them all.
+MEDIA_PATTERN = re.compile(
+    r"(?=(?:.*?\[(?P<quality>.*?)\])?)"
+    r"(?=(?:(?P<tv_title>.*?)S(?P<season>\d+)E(?P<episode>\d+))?)"
+    r"(?=(?:(?P<tv_year_title>.*?)[(\s](?P<tv_year>\d{4})[)\s])?)"
+    r"(?=(?:(?P<movie_title>.*?)(?P<movie_year>\d{4}))?)",
+    re.IGNORECASE,
+)
+UNSAFE_CHARS = re.compile(r"[^\w\s-]")
+
+
+class MediaClassification(NamedTuple):
+    kind: str  # "tv" or "movie"
+    title: str
+    year: Optional[str]
+    season: Optional[int]
+    episode: Optional[int]
+    quality: Optional[str]
+    path: str
+
+
+def sanitize_name(text):
+    return UNSAFE_CHARS.sub("", text.replace(".", " ")).strip()
+
+
+@lru_cache(maxsize=4096)
+def classify_media(file_name):
+    """Work out what a release file is and where it belongs in the library.
+
+    The name is matched once against MEDIA_PATTERN and results are memoized,
+    so bulk scans and repeated forwards of the same file are cheap.
+    """
+    name, extension = os.path.splitext(file_name)
+    extension = extension.lower()
+    match = MEDIA_PATTERN.match(name)
+    quality = match.group("quality")
+
+    if match.group("season") is not None:
+        season = int(match.group("season"))
+        episode = int(match.group("episode"))
+        quality_suffix = f" [{quality}]" if quality is not None else ""
+
+        year = match.group("tv_year")
+        if year is not None:
+            title = sanitize_name(match.group("tv_year_title").strip())
+            show_folder = f"{title} ({year})"
+        else:
+            title = sanitize_name(match.group("tv_title").strip())
+            show_folder = title
+
+        file_name = f"{title} - s{season:02d}e{episode:02d}{quality_suffix}{extension}"
+        path = os.path.join("tv-shows", show_folder, f"Season {season:02d}", file_name)
+        return MediaClassification("tv", title, year, season, episode, quality, path)
+
+    quality_suffix = f" {quality}" if quality is not None else ""
+    year = match.group("movie_year")
+    if year is not None:
+        title = sanitize_name(match.group("movie_title").strip())
+        file_name = f"{title} ({year}){quality_suffix}{extension}"
+    else:
+        title = sanitize_name(name)
+        file_name = f"{title}{quality_suffix}{extension}"
+
+    path = os.path.join("movies", file_name)
+    return MediaClassification("movie", title, year, None, None, quality, path)
+
+
+def classify_many(file_names):
+    """Classify a batch of names, e.g. from a library scan, in input order"""
+    return [classify_media(file_name) for file_name in file_names]
+
+
+def classify_group(file_names):
+    """Classify files that arrived together, e.g. a season pack sent as an album.
+
+    Episodes of the same show share the show folder of the first one that
+    names a year, so a pack where only some files carry the year still lands
+    in a single folder. Titleless names (``S01E01.mkv``) are left as they are.
+    """
+    classified = classify_many(file_names)
+    show_folders = {}
+    for media in classified:
+        if media.kind == "tv" and media.title and media.year:
+            show_folders.setdefault(
+                media.title.lower(), f"{media.title} ({media.year})"
+            )
+
+    grouped = []
+    for media in classified:
+        show_folder = None
+        if media.kind == "tv" and not media.year:
+            show_folder = show_folders.get(media.title.lower())
+        if show_folder:
+            media = media._replace(
+                path=os.path.join(
+                    "tv-shows",
+                    show_folder,
+                    f"Season {media.season:02d}",
+                    os.path.basename(media.path),
+                )
+            )
+        grouped.append(media)
+    return grouped
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+
+from config import SESSION_BACKEND, SESSION_DB_PATH, SESSION_MAX_ENTRIES, SESSION_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySessionBackend:
+    """Process-local sessions kept in LRU order"""
+
+    blocking = False
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+
+    def get(self, key, now):
+        entry = self._sessions.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= now:
+            del self._sessions[key]
+            return None
+        self._sessions.move_to_end(key)
+        return data
+
+    def set(self, key, data, expires_at):
+        self._sessions[key] = (expires_at, data)
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+
+    def delete(self, key):
+        self._sessions.pop(key, None)
+
+
+class SqliteSessionBackend:
+    """Sessions in a SQLite file, shareable by several bot processes"""
+
+    blocking = True
+
+    def __init__(self, db_path, max_entries):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.db_path, timeout=10, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "key TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)"
+            )
+        return self._conn
+
+    def get(self, key, now):
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT data FROM sessions WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                )
+                .fetchone()
+            )
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, data, expires_at):
+        now = time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, data, expires_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(data), expires_at, now),
+            )
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions "
+                "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            conn.commit()
+
+
+class SessionStore:
+    """Conversation state per (chat, user) with TTL expiry and a size bound"""
+
+    def __init__(self, backend, ttl=SESSION_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def key(event):
+        return f"{event.chat_id}:{event.sender_id}"
+
+    async def _run(self, func, *args):
+        if not self.backend.blocking:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def get(self, event):
+        """Return a copy of the session for this event's chat and sender"""
+        data = await self._run(self.backend.get, self.key(event), time())
+        return dict(data) if data else {}
+
+    async def save(self, event, data):
+        await self._run(self.backend.set, self.key(event), data, time() + self.ttl)
+
+    async def clear(self, event):
+        await self._run(self.backend.delete, self.key(event))
+
+
+def create_session_store():
+    if SESSION_BACKEND == "sqlite":
+        backend = SqliteSessionBackend(SESSION_DB_PATH, SESSION_MAX_ENTRIES)
+    else:
+        if SESSION_BACKEND != "memory":
+            logger.warning(f"Unknown SESSION_BACKEND {SESSION_BACKEND}, using memory")
+        backend = MemorySessionBackend(SESSION_MAX_ENTRIES)
+    return SessionStore(backend)
+
+
+session_store = create_session_store()
@@ -0,0 +1,260 @@
+"""Scale-out mode: one ingress process feeding N handler worker processes.
+
+Updates are forwarded as raw TL bytes, sharded by chat id so each chat is
+always handled by the same worker and in arrival order.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from queue import Full
+
+import telethon
+from telethon import TelegramClient, events, utils
+from telethon.extensions import BinaryReader
+from telethon.tl import types
+
+from config import (
+    API_ID,
+    API_HASH,
+    BOT_WORKERS,
+    METRICS_PORT,
+    SESSION_BACKEND,
+    UPDATE_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+ROUTED_UPDATES = [types.UpdateNewMessage, types.UpdateBotCallbackQuery]
+
+
+def check_telethon():
+    """Fail fast if this Telethon lacks the internals workers dispatch through.
+
+    ChatOrderedDispatcher relies on TelegramClient._dispatch_update and the
+    update entity cache, which are not public API. They exist from 1.28 on
+    through the 1.x releases; requirements pin a version known to work.
+    """
+    try:
+        from telethon._updates import EntityCache
+
+        supported = hasattr(TelegramClient, "_dispatch_update") and hasattr(
+            EntityCache, "extend"
+        )
+    except ImportError:
+        supported = False
+    if not supported:
+        raise RuntimeError(
+            f"BOT_MODE=scaleout is not supported with Telethon {telethon.__version__}; "
+            "install the version pinned in requirements.txt"
+        )
+
+
+def update_chat_id(update):
+    if isinstance(update, types.UpdateNewMessage):
+        return utils.get_peer_id(update.message.peer_id)
+    return utils.get_peer_id(update.peer)
+
+
+def update_peers(update):
+    if isinstance(update, types.UpdateNewMessage):
+        peers = [update.message.peer_id, update.message.from_id]
+    else:
+        peers = [update.peer, types.PeerUser(update.user_id)]
+    return [peer for peer in peers if peer is not None]
+
+
+class WorkerPool:
+    """Owns the worker processes and forwards updates to them from the ingress.
+
+    The ingress client handles updates sequentially, so updates reach each
+    worker's queue in the order Telegram delivered them.
+    """
+
+    def __init__(
+        self, workers=BOT_WORKERS, target=None, args=(), queue_size=UPDATE_QUEUE_SIZE
+    ):
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes = [
+            context.Process(
+                target=target or worker_main,
+                args=(index, queue, *args),
+                name=f"bot-worker-{index}",
+            )
+            for index, queue in enumerate(self.queues)
+        ]
+        self.client = None
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        logger.info(f"Started {len(self.processes)} bot worker processes")
+
+    def stop(self):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop, terminating it")
+                process.terminate()
+
+    async def _entities(self, update):
+        """The update's users and chats, as Telethon attached them on receipt"""
+        known = getattr(update, "_entities", None) or {}
+        entities = []
+        # In a private chat the sender is also the chat; send it once
+        peers = {utils.get_peer_id(peer): peer for peer in update_peers(update)}
+        for peer_id, peer in peers.items():
+            entity = known.get(peer_id)
+            if entity is None:
+                # Not sent along with the update; rare, so fetching is affordable
+                try:
+                    entity = await self.client.get_entity(peer)
+                except Exception as e:
+                    logger.warning(f"Could not resolve {peer} for forwarding: {str(e)}")
+                    continue
+            entities.append(entity)
+        return entities
+
+    async def forward(self, update):
+        chat_id = update_chat_id(update)
+        entities = await self._entities(update)
+        payload = (bytes(update), [bytes(entity) for entity in entities])
+        queue = self.queues[chat_id % len(self.queues)]
+        try:
+            queue.put_nowait(payload)
+        except Full:
+            # A full queue blocks here, which pushes back on the ingress process
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, queue.put, payload)
+
+    async def run_ingress(self):
+        from modules.metrics import metrics
+        from utils.lifecycle import start_client
+
+        metrics.gauge(
+            "rpa_update_queue_depth",
+            "Updates waiting for each worker",
+            lambda: {(str(i),): queue.qsize() for i, queue in enumerate(self.queues)},
+            labels=("worker",),
+        )
+        # One update at a time, so forwarding keeps Telegram's order per chat
+        self.client = TelegramClient("bot", API_ID, API_HASH, sequential_updates=True)
+        self.client.add_event_handler(self.forward, events.Raw(types=ROUTED_UPDATES))
+        try:
+            await start_client(self.client)
+            await metrics.start()
+            await self.client.run_until_disconnected()
+        finally:
+            await metrics.close()
+            await self.client.disconnect()
+
+
+class ChatOrderedDispatcher:
+    """Dispatches forwarded updates, concurrently across chats, in order per chat"""
+
+    def __init__(self, client):
+        self.client = client
+        self._tails = {}
+
+    def submit(self, update_bytes, entity_bytes):
+        update = BinaryReader(update_bytes).tgread_object()
+        entities = [BinaryReader(data).tgread_object() for data in entity_bytes]
+        chat_id = update_chat_id(update)
+
+        task = asyncio.ensure_future(
+            self._dispatch(self._tails.get(chat_id), update, entities)
+        )
+        self._tails[chat_id] = task
+        task.add_done_callback(lambda done: self._release(chat_id, done))
+
+    def _release(self, chat_id, task):
+        if self._tails.get(chat_id) is task:
+            del self._tails[chat_id]
+
+    def _cache_entities(self, entities):
+        # Persist access hashes and prime Telethon's entity cache so events
+        # built from the forwarded update can resolve their sender and chat.
+        self.client.session.process_entities(entities)
+        self.client._mb_entity_cache.extend(
+            [e for e in entities if isinstance(e, types.User)],
+            [e for e in entities if not isinstance(e, types.User)],
+        )
+
+    async def _dispatch(self, previous, update, entities):
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            self._cache_entities(entities)
+            # Same entry point Telethon uses for updates read from the network
+            await self.client._dispatch_update(update)
+        except Exception as e:
+            logger.error(f"Error dispatching forwarded update: {str(e)}")
+
+    async def drain(self):
+        if self._tails:
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
+
+
+async def run_worker(index, queue):
+    from handlers import register_handlers
+    from modules.metrics import metrics
+    from plugins import load_plugins
+    from utils.lifecycle import start_client, shutdown
+
+    client = TelegramClient(
+        f"bot-worker-{index}", API_ID, API_HASH, receive_updates=False
+    )
+    plugins = {}
+    try:
+        plugins = load_plugins()
+        register_handlers(client, plugins)
+        await start_client(client)
+        plugins.warm()
+        # The ingress process owns METRICS_PORT; workers listen on the ports after it
+        await metrics.start(port=METRICS_PORT + 1 + index if METRICS_PORT else 0)
+        dispatcher = ChatOrderedDispatcher(client)
+        loop = asyncio.get_running_loop()
+        logger.info(f"Worker {index} ready")
+
+        while True:
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            dispatcher.submit(*item)
+
+        await dispatcher.drain()
+    except Exception as e:
+        logger.error(f"Error in worker {index}: {str(e)}")
+    finally:
+        await shutdown(client, plugins)
+        logger.info(f"Worker {index} stopped")
+
+
+def worker_main(index, queue):
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker-{index} - %(levelname)s - %(message)s",
+    )
+    asyncio.run(run_worker(index, queue))
+
+
+def run_scaleout():
+    check_telethon()
+    if SESSION_BACKEND == "memory":
+        logger.warning(
+            "SESSION_BACKEND=memory keeps conversation state per worker; "
+            "use SESSION_BACKEND=sqlite in scale-out mode"
+        )
+
+    pool = WorkerPool()
+    pool.start()
+    try:
+        asyncio.run(pool.run_ingress())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+        logger.info("Bot stopped")
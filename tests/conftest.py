@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The bot runs from src/ (python src/main.py), so modules import each other
+# as top-level packages
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
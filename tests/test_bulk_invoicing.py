@@ -0,0 +1,65 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from modules import bulk_invoicing
+from modules.bulk_invoicing import BulkInvoicer
+
+COLUMNS = {"product_id": 0, "customer_name": 1, "weekly_installment": 2}
+
+
+class FakeZoho:
+    async def get_customers(self, contact_name):
+        return [{"contact_id": f"c-{contact_name}"}]
+
+    async def find_invoice(self, reference):
+        return None
+
+    async def submit_invoice(self, invoice):
+        await asyncio.sleep(0.001)
+        return {"invoice_id": f"inv-{invoice['reference_number']}"}
+
+
+def make_invoicer(monkeypatch, tmp_path, products=40):
+    monkeypatch.setattr(bulk_invoicing, "CHECKPOINT_DIR", str(tmp_path))
+    rows = [[f"P{i:03d}", f"Customer {i % 5}", "100"] for i in range(products)]
+    catalog = SimpleNamespace(columns=COLUMNS, active_products=rows)
+    return BulkInvoicer(FakeZoho(), catalog, "2026-09", concurrency=8)
+
+
+def test_run_journals_marks_in_groups_and_compacts(monkeypatch, tmp_path):
+    invoicer = make_invoicer(monkeypatch, tmp_path)
+    writes = []
+    append_journal = invoicer._append_journal
+
+    def counting_append(lines):
+        writes.append(len(lines))
+        append_journal(lines)
+
+    invoicer._append_journal = counting_append
+    summary = asyncio.run(invoicer.run())
+
+    assert summary.created == 40
+    # Two marks per invoice ("submitting", "created"), fewer fsyncs than marks
+    assert sum(writes) == 80
+    assert len(writes) < 80
+    assert not (tmp_path / "2026-09.journal").exists()
+    with open(tmp_path / "2026-09.json") as f:
+        state = json.load(f)
+    assert {entry["status"] for entry in state.values()} == {"created"}
+    assert len(state) == 40
+
+
+def test_checkpoint_replays_journal_up_to_a_torn_line(monkeypatch, tmp_path):
+    invoicer = make_invoicer(monkeypatch, tmp_path)
+    with open(tmp_path / "2026-09.json", "w") as f:
+        json.dump({"P000": {"status": "created", "invoice_id": "a"}}, f)
+    with open(tmp_path / "2026-09.journal", "w") as f:
+        f.write(json.dumps({"product_id": "P001", "status": "submitting"}) + "\n")
+        f.write(json.dumps({"product_id": "P001", "status": "created"}) + "\n")
+        f.write('{"product_id": "P002", "sta')
+
+    assert invoicer._read_checkpoint() == {
+        "P000": {"status": "created", "invoice_id": "a"},
+        "P001": {"status": "created"},
+    }
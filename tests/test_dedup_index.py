@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+from modules.dedup_index import DedupIndex, hash_file
+
+
+def test_same_content_is_found_after_a_rename(tmp_path):
+    library = tmp_path / "library"
+    (library / "movies").mkdir(parents=True)
+    original = library / "movies" / "Film (2019).mkv"
+    original.write_bytes(b"frames" * 1000)
+    index = DedupIndex(
+        db_path=str(tmp_path / "dedup.sqlite3"), library_dir=str(library)
+    )
+    size, checksum = original.stat().st_size, hash_file(str(original))
+
+    async def scenario():
+        await index.scan_library(hash_content=True)
+        renamed = library / "movies" / "Film.2019.1080p.mkv"
+        os.rename(original, renamed)
+        await index.scan_library(hash_content=True)
+        found = await index.find_same_content(size, checksum)
+        os.remove(renamed)
+        gone = await index.find_same_content(size, checksum)
+        other = await index.find_same_content(size, "0" * 64)
+        return found, gone, other
+
+    found, gone, other = asyncio.run(scenario())
+    assert found == os.path.join("movies", "Film.2019.1080p.mkv")
+    assert gone is None
+    assert other is None
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from modules.disk_space import DiskSpaceLedger, InsufficientSpaceError
+
+MB = 1024 * 1024
+
+
+def make_ledgers(tmp_path, count=2):
+    stats = os.statvfs(tmp_path)
+    # Leave roughly 10 MB to share between the ledgers
+    headroom = stats.f_bavail * stats.f_frsize - 10 * MB
+    db_path = str(tmp_path / "state" / "disk.sqlite3")
+    return [
+        DiskSpaceLedger(root=str(tmp_path), headroom=headroom, db_path=db_path)
+        for _ in range(count)
+    ]
+
+
+def test_reservations_are_shared_between_ledgers(tmp_path):
+    first, second = make_ledgers(tmp_path)
+
+    async def scenario():
+        reservation = await first.reserve(str(tmp_path / "a.bin"), 8 * MB, "1")
+        with pytest.raises(InsufficientSpaceError):
+            await second.reserve(str(tmp_path / "b.bin"), 8 * MB, "2")
+        assert "a.bin" in await second.report()
+        first.release(reservation)
+        await asyncio.sleep(0.1)
+        await second.reserve(str(tmp_path / "b.bin"), 8 * MB, "2")
+
+    asyncio.run(scenario())
+
+
+def test_reservations_of_exited_processes_are_dropped(tmp_path):
+    (ledger,) = make_ledgers(tmp_path, 1)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+
+    async def scenario():
+        await ledger._run(ledger._snapshot)
+        ledger._connection().execute(
+            "INSERT INTO reservations (path, size, owner, pid, created_at) "
+            "VALUES (?, ?, '', ?, 0)",
+            (str(tmp_path / "stale.bin"), 8 * MB, exited.pid),
+        )
+        await ledger.reserve(str(tmp_path / "new.bin"), 8 * MB, "1")
+
+    asyncio.run(scenario())
@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from modules.file_downloader import DownloadScheduler
+
+
+def make_event(document_id, size=100, sender_id=1):
+    document = SimpleNamespace(id=document_id, size=size, attributes=[])
+    return SimpleNamespace(document=document, sender_id=sender_id)
+
+
+def test_document_is_active_until_its_job_is_cancelled():
+    # No free slots, so jobs stay queued and nothing is downloaded
+    scheduler = DownloadScheduler(max_concurrent=0)
+    first = make_event(42)
+    job = scheduler.submit(first, client=None)
+
+    assert scheduler.active_job(make_event(42, sender_id=2).document) is job
+    assert scheduler.active_job(make_event(43).document) is None
+
+    scheduler.cancel(job.id)
+    assert scheduler.active_job(first.document) is None
+
+
+def test_album_registers_every_document():
+    scheduler = DownloadScheduler(max_concurrent=0)
+    events = [make_event(1), make_event(2)]
+    job = scheduler.submit_album(events, client=None)
+
+    assert [scheduler.active_job(event.document) for event in events] == [job, job]
+    assert job.size == 200
@@ -0,0 +1,55 @@
+import os
+
+import modules.library_reorganizer as reorganizer
+from modules.library_reorganizer import LibraryReorganizer
+
+
+class FakeIndex:
+    def __init__(self, names):
+        self.names = names
+        self.renamed = []
+
+    def file_names(self, paths):
+        return {path: self.names[path] for path in paths if path in self.names}
+
+    def rename_paths(self, moves):
+        self.renamed.extend(moves)
+
+
+def make_library(root, paths):
+    for path in paths:
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, "w").close()
+
+
+def test_unindexed_files_are_classified_by_current_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(reorganizer, "PLAN_PATH", str(tmp_path / "plan.jsonl"))
+    monkeypatch.setattr(reorganizer, "DONE_PATH", str(tmp_path / "done.log"))
+    library = str(tmp_path / "library")
+    make_library(
+        library,
+        [
+            # Indexed: moved from its original name
+            "movies/Old Name.mkv",
+            # Not indexed, clean name but in the wrong folder
+            "tv-shows/Film (2019).mkv",
+            # Not indexed, reclassifying would rename it
+            "movies/Film (2020) 1080p.mkv",
+            # Not indexed and already in place
+            "movies/Other (1999).mkv",
+        ],
+    )
+    index = FakeIndex({"movies/Old Name.mkv": "New.Name.2021.mkv"})
+    report = LibraryReorganizer(library, index, workers=2).apply()
+
+    assert sorted(report.moves) == [
+        ("movies/Old Name.mkv", "movies/New Name (2021).mkv"),
+        ("tv-shows/Film (2019).mkv", "movies/Film (2019).mkv"),
+    ]
+    assert report.conflicts == [
+        ("movies/Film (2020) 1080p.mkv", "movies/Film (2020).mkv")
+    ]
+    assert report.unknown == 3 and report.in_place == 1 and report.moved == 2
+    assert os.path.exists(os.path.join(library, "movies/Film (2019).mkv"))
+    assert os.path.exists(os.path.join(library, "movies/Film (2020) 1080p.mkv"))
@@ -0,0 +1,27 @@
+from utils.media_classifier import classify_group, classify_media
+
+
+def test_group_shares_show_folder_with_year():
+    paths = [
+        media.path
+        for media in classify_group(
+            ["Show (2019) S01E01 [1080p].mkv", "Show S01E02 [1080p].mkv"]
+        )
+    ]
+    assert paths == [
+        "tv-shows/Show (2019)/Season 01/Show - s01e01 [1080p].mkv",
+        "tv-shows/Show (2019)/Season 01/Show - s01e02 [1080p].mkv",
+    ]
+
+
+def test_group_keeps_titleless_episodes_as_single_uploads_would():
+    names = ["S01E01.mkv", "S01E02.mkv", "Show (2019) S01E03.mkv"]
+    grouped = classify_group(names)
+    assert [media.path for media in grouped[:2]] == [
+        classify_media(name).path for name in names[:2]
+    ]
+
+
+def test_group_leaves_movies_and_other_years_alone():
+    names = ["Movie 2020.mkv", "Other (2001) S02E01.mkv", "Other (2003) S02E02.mkv"]
+    assert classify_group(names) == [classify_media(name) for name in names]
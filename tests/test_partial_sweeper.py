@@ -0,0 +1,35 @@
+import os
+from time import time
+
+from modules.file_downloader import PartialSweeper
+
+
+def touch(path, age, size=4096):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    stamp = time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def test_sweep_removes_only_abandoned_staging_files(tmp_path):
+    touch(tmp_path / "1-old.mkv", age=7200)
+    touch(tmp_path / "1-old.mkv.parts", age=7200, size=10)
+    # Data file untouched for a while, but its journal was just appended to
+    touch(tmp_path / "2-active.mkv", age=7200)
+    touch(tmp_path / "2-active.mkv.parts", age=10, size=10)
+    touch(tmp_path / "3-fresh.mkv", age=10)
+    touch(tmp_path / "4-orphan.mkv.parts", age=7200, size=10)
+
+    removed, freed = PartialSweeper(str(tmp_path), max_age=3600).sweep()
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "2-active.mkv",
+        "2-active.mkv.parts",
+        "3-fresh.mkv",
+    ]
+    assert removed == 2
+    assert freed > 0
+
+
+def test_sweep_without_staging_directory(tmp_path):
+    assert PartialSweeper(str(tmp_path / "missing")).sweep() == (0, 0)
@@ -0,0 +1,61 @@
+import asyncio
+import sys
+import threading
+import types
+
+from plugins import PluginRegistry
+
+
+class SlowPlugin:
+    def __init__(self):
+        self.threads = [threading.current_thread()]
+
+    def warm(self):
+        self.threads.append(threading.current_thread())
+
+
+def test_aget_sets_up_on_the_loop_and_warms_off_it(monkeypatch):
+    module = types.ModuleType("fake_plugin")
+    module.setup = SlowPlugin
+    monkeypatch.setitem(sys.modules, "fake_plugin", module)
+
+    async def scenario():
+        registry = PluginRegistry({"slow": "fake_plugin"})
+        registry.warm()
+        first, second = await asyncio.gather(
+            registry.aget("slow"), registry.aget("slow")
+        )
+        missing = await registry.aget("missing", "default")
+        return first, second, missing
+
+    first, second, missing = asyncio.run(scenario())
+    assert first is second
+    assert missing == "default"
+    # setup() runs on the loop, warm() in the executor
+    assert first.threads[0] is threading.main_thread()
+    assert first.threads[1] is not threading.main_thread()
+
+
+class LoopBoundLock(asyncio.Lock):
+    """asyncio.Lock as on Python 3.9, which looks up the thread's event loop"""
+
+    def __init__(self):
+        asyncio.get_event_loop()
+        super().__init__()
+
+
+def test_real_plugins_load_from_a_worker_thread(monkeypatch):
+    monkeypatch.setattr(asyncio, "Lock", LoopBoundLock)
+    registry = PluginRegistry()
+    loaded = {}
+    thread = threading.Thread(
+        target=lambda: loaded.update(zoho=registry.get("zoho_invoicing"))
+    )
+    thread.start()
+    thread.join()
+    assert loaded["zoho"] is not None, registry.errors
+
+    async def scenario():
+        return await PluginRegistry().aget("zoho_invoicing")
+
+    assert asyncio.run(scenario()) is not None
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+from handlers.router import Router
+
+
+def make_router(calls):
+    router = Router()
+
+    @router.command("help")
+    async def help_command(event):
+        calls.append(("help", event.raw_text))
+
+    @router.default
+    async def fallback(event):
+        calls.append(("default", event.raw_text))
+
+    return router
+
+
+def test_dispatch_message_routes_commands_and_bare_slashes():
+    calls = []
+    router = make_router(calls)
+    texts = ["/help", "/HELP@SomeBot now", "/", "/ ", "/\n", "/unknown", "hello"]
+
+    async def scenario():
+        for text in texts:
+            await router.dispatch_message(SimpleNamespace(sender_id=1, raw_text=text))
+
+    asyncio.run(scenario())
+    assert calls == [
+        ("help", "/help"),
+        ("help", "/HELP@SomeBot now"),
+        ("default", "/"),
+        ("default", "/ "),
+        ("default", "/\n"),
+        ("default", "/unknown"),
+        ("default", "hello"),
+    ]
@@ -0,0 +1,150 @@
+import asyncio
+import re
+
+from plugins.google_sheets import EnhancedGoogleSheetsModule
+
+CELL = re.compile(r"([A-Z]+)(\d*)")
+
+
+def column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+class FakeSheet:
+    """Just enough of the Sheets values API to back one worksheet in memory"""
+
+    def __init__(self):
+        self.rows = {}
+        self.appends = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def _parse(self, range_name):
+        cells = range_name.split("!", 1)[1].split(":")
+        (first, first_row), (last, last_row) = (
+            CELL.fullmatch(cells[0]).groups(),
+            CELL.fullmatch(cells[-1]).groups(),
+        )
+        return column_index(first), column_index(last), first_row, last_row
+
+    def get(self, spreadsheetId, **kwargs):
+        first, last, first_row, _ = self._parse(kwargs["range"])
+        rows = [int(first_row)] if first_row else sorted(self.rows)
+        values = [
+            [self.rows.get(row, {}).get(col, "") for col in range(first, last + 1)]
+            for row in rows
+        ]
+        while values and not any(values[-1]):
+            values.pop()
+        return lambda: {"values": values}
+
+    def batchUpdate(self, spreadsheetId, body):
+        def execute():
+            for item in body["data"]:
+                col, _, row, _ = self._parse(item["range"])
+                self.rows.setdefault(int(row), {})[col] = item["values"][0][0]
+            return {}
+
+        return execute
+
+    def append(self, spreadsheetId, body, **kwargs):
+        self.appends.append((kwargs["range"], kwargs["insertDataOption"]))
+
+        def execute():
+            for values in body["values"]:
+                row = max(self.rows, default=0) + 1
+                self.rows[row] = dict(enumerate(values))
+            return {}
+
+        return execute
+
+
+class FakeTransport:
+    async def execute(self, request):
+        return request()
+
+    def shutdown(self):
+        pass
+
+
+def make_module():
+    sheets = EnhancedGoogleSheetsModule()
+    sheets._service = FakeSheet()
+    sheets._transport = FakeTransport()
+    sheets.write_queue.window = 0
+    return sheets
+
+
+def test_sparse_append_resyncs_after_outside_edit():
+    async def scenario():
+        sheets = make_module()
+        sheet = sheets._service
+        await sheets.append_sparse_row("wb", "Sales", {0: "a", 2: "x"})
+        # Someone types into the next row directly in the sheet
+        sheet.rows[2] = {0: "manual"}
+        await sheets.append_sparse_row("wb", "Sales", {0: "b", 2: "y"})
+        return sheet.rows
+
+    rows = asyncio.run(scenario())
+    assert rows[2] == {0: "manual"}
+    assert rows[3] == {0: "b", 2: "y"}
+
+
+def test_sparse_append_follows_queued_add_row():
+    async def scenario():
+        sheets = make_module()
+        await sheets.append_sparse_row("wb", "Sales", {0: "a"})
+        await sheets.add_row("wb", "Sales", ["queued"])
+        await sheets.append_sparse_row("wb", "Sales", {0: "b"})
+        await sheets.close()
+        return sheets._service.rows
+
+    rows = asyncio.run(scenario())
+    assert [rows[row][0] for row in sorted(rows)] == ["a", "queued", "b"]
+
+
+def test_callers_keep_their_append_semantics():
+    async def scenario():
+        sheets = make_module()
+        await asyncio.gather(
+            sheets.add_row("wb", "Sales", ["overwrite"]),
+            sheets.append_row("wb", "Sales", ["insert"]),
+        )
+        await sheets.close()
+        return sheets._service.appends
+
+    appends = asyncio.run(scenario())
+    assert sorted(appends) == [
+        ("Sales!A1", "INSERT_ROWS"),
+        ("Sales!A:A", "OVERWRITE"),
+    ]
+
+
+def test_pending_appends_gauge_is_registered_once():
+    from modules.metrics import metrics
+
+    async def scenario():
+        modules = [make_module(), make_module()]
+        for sheets in modules:
+            sheets.write_queue.window = 60
+        tasks = [
+            asyncio.ensure_future(sheets.append_row("wb", "Sales", ["row"]))
+            for sheets in modules
+        ]
+        await asyncio.sleep(0)
+        rendered = metrics.render()
+        for sheets in modules:
+            await sheets.close()
+        await asyncio.gather(*tasks)
+        return rendered
+
+    rendered = asyncio.run(scenario())
+    assert rendered.count("# TYPE rpa_sheets_appends_pending gauge") == 1
+    assert "\nrpa_sheets_appends_pending 2\n" in rendered
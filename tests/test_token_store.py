@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from modules.token_store import TokenStore
+
+
+def test_tokens_migrate_from_legacy_file_once(tmp_path):
+    legacy = tmp_path / "zoho_tokens.json"
+    legacy.write_text(json.dumps({"access_token": "a", "refresh_token": "r"}))
+    path = tmp_path / "zoho" / "zoho_tokens.json"
+
+    tokens = asyncio.run(TokenStore(str(path), legacy_path=str(legacy)).load())
+    assert tokens["refresh_token"] == "r"
+    assert json.loads(path.read_text()) == tokens
+
+    # The new file wins from now on
+    legacy.write_text(json.dumps({"access_token": "old", "refresh_token": "old"}))
+    tokens = asyncio.run(TokenStore(str(path), legacy_path=str(legacy)).load())
+    assert tokens["access_token"] == "a"
+
+
+def test_missing_legacy_file_is_not_an_error(tmp_path):
+    (tmp_path / "legacy").mkdir()
+    store = TokenStore(
+        str(tmp_path / "zoho_tokens.json"), legacy_path=str(tmp_path / "legacy")
+    )
+    assert asyncio.run(store.load()) == {}
+
+
+def test_coalesced_updates_are_saved(tmp_path):
+    path = tmp_path / "zoho_tokens.json"
+
+    async def scenario():
+        store = TokenStore(str(path), save_delay=0.01, legacy_path=None)
+        await store.load()
+        for i in range(5):
+            store.update(access_token=f"token-{i}")
+        await store.flush()
+
+    asyncio.run(scenario())
+    assert json.loads(path.read_text())["access_token"] == "token-4"
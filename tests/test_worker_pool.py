@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timezone
+
+from telethon.extensions import BinaryReader
+from telethon.tl import types
+
+from worker_pool import WorkerPool
+
+
+class NoLookupClient:
+    async def get_entity(self, peer):
+        raise AssertionError(f"forward() looked up {peer}")
+
+
+def make_update(message_id, chat_id):
+    message = types.Message(
+        id=message_id,
+        peer_id=types.PeerUser(chat_id),
+        date=datetime.now(timezone.utc),
+        message="hi",
+        from_id=types.PeerUser(chat_id),
+    )
+    update = types.UpdateNewMessage(message=message, pts=message_id, pts_count=1)
+    update._entities = {chat_id: types.User(id=chat_id, access_hash=1)}
+    return update
+
+
+def test_forward_uses_attached_entities_and_keeps_chat_order():
+    pool = WorkerPool(workers=2, queue_size=100)
+    pool.client = NoLookupClient()
+
+    chats = [10 + message_id % 3 for message_id in range(1, 21)]
+
+    async def scenario():
+        for message_id, chat_id in enumerate(chats, start=1):
+            await pool.forward(make_update(message_id, chat_id))
+
+    asyncio.run(scenario())
+    for index, queue in enumerate(pool.queues):
+        last_seen = {}
+        # Queued items reach the pipe from a feeder thread, so empty() can lie
+        for _ in range(sum(1 for chat_id in chats if chat_id % 2 == index)):
+            update_bytes, entity_bytes = queue.get(timeout=5)
+            message = BinaryReader(update_bytes).tgread_object().message
+            chat_id = message.peer_id.user_id
+            assert chat_id % 2 == index
+            assert message.id > last_seen.get(chat_id, 0)
+            last_seen[chat_id] = message.id
+            (user,) = [BinaryReader(data).tgread_object() for data in entity_bytes]
+            assert user.id == chat_id
+        assert queue.empty()
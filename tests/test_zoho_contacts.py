@@ -0,0 +1,42 @@
+import random
+
+from modules.zoho_contacts import SEARCH_FIELDS, ContactDirectory
+
+WORDS = ["Acme", "Global", "Kwame", "Ama", "Trading", "Ltd", "Foods", "amazing"]
+
+
+def make_directory(count=300):
+    rng = random.Random(7)
+    directory = ContactDirectory(zoho=None)
+    for i in range(count):
+        name = " ".join(rng.sample(WORDS, 2))
+        directory.contacts[str(i)] = {
+            "contact_id": str(i),
+            "contact_name": name,
+            "company_name": f"{name} {i}",
+            "email": f"{name.replace(' ', '.').lower()}{i}@example.com",
+            "phone": f"+23324{i:07d}",
+        }
+    directory._build_index()
+    return directory
+
+
+def scan(directory, fields, text):
+    return {
+        contact_id
+        for contact_id, contact in directory.contacts.items()
+        for field in fields
+        if text in str(contact.get(field) or "").lower()
+    }
+
+
+def test_contains_matches_a_full_scan():
+    directory = make_directory()
+    for text in ["am", "ama", "amaz", "e.t", "0042", "acme global", "zzz", "l"]:
+        for field in SEARCH_FIELDS:
+            found = {
+                c["contact_id"] for c in directory.search(**{f"{field}_contains": text})
+            }
+            assert found == scan(directory, [field], text), (field, text)
+        found = {c["contact_id"] for c in directory.search(search_text=text)}
+        assert found == scan(directory, SEARCH_FIELDS, text), text
@@ -0,0 +1,104 @@
+import asyncio
+from time import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import modules.zoho_invoicing as zoho_invoicing
+from modules.token_store import TokenStore
+from modules.zoho_invoicing import ZohoInvoicing
+
+
+class FakeZoho:
+    """Local stand-in for the Zoho accounts and Books endpoints"""
+
+    def __init__(self, valid_tokens=()):
+        self.valid_tokens = set(valid_tokens)
+        self.refreshes = 0
+        self.api_tokens = []
+
+    async def token(self, request):
+        form = await request.post()
+        assert form["grant_type"] == "refresh_token"
+        self.refreshes += 1
+        # Slow enough for concurrent callers to pile up behind the refresh
+        await asyncio.sleep(0.05)
+        token = f"token-{self.refreshes}"
+        self.valid_tokens.add(token)
+        return web.json_response({"access_token": token, "expires_in": 3600})
+
+    async def invoices(self, request):
+        token = request.headers["Authorization"].split()[-1]
+        self.api_tokens.append(token)
+        if token not in self.valid_tokens:
+            return web.json_response({"message": "Invalid token"}, status=401)
+        return web.json_response({"invoices": []})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/oauth/v2/token", self.token)
+        app.router.add_get("/books/v3/invoices", self.invoices)
+        return app
+
+
+async def run_against(fake, tokens, scenario, tmp_path, monkeypatch):
+    server = TestServer(fake.app())
+    await server.start_server()
+    monkeypatch.setattr(
+        zoho_invoicing, "TOKEN_URL", str(server.make_url("/oauth/v2/token"))
+    )
+    zoho = ZohoInvoicing()
+    zoho.base_url = str(server.make_url("/books/v3"))
+    zoho.organization_id = "org"
+    zoho.token_store = TokenStore(
+        str(tmp_path / "zoho_tokens.json"), save_delay=0, legacy_path=None
+    )
+    zoho.token_store.tokens = tokens
+    zoho.token_store.loaded = True
+    try:
+        return await scenario(zoho)
+    finally:
+        await zoho.close()
+        await server.close()
+
+
+def test_concurrent_callers_share_one_refresh(tmp_path, monkeypatch):
+    fake = FakeZoho()
+    tokens = {"access_token": "old", "refresh_token": "r", "expires_at": time() - 1}
+
+    async def scenario(zoho):
+        return await asyncio.gather(*(zoho.find_invoice("ref") for _ in range(10)))
+
+    results = asyncio.run(run_against(fake, tokens, scenario, tmp_path, monkeypatch))
+    assert results == [None] * 10
+    assert fake.refreshes == 1
+    assert set(fake.api_tokens) == {"token-1"}
+
+
+def test_token_is_refreshed_before_it_expires(tmp_path, monkeypatch):
+    fake = FakeZoho(valid_tokens={"old"})
+    tokens = {"access_token": "old", "refresh_token": "r", "expires_at": time() + 60}
+
+    async def scenario(zoho):
+        await zoho.find_invoice("ref")
+        return zoho.token_store.tokens
+
+    saved = asyncio.run(run_against(fake, tokens, scenario, tmp_path, monkeypatch))
+    assert fake.refreshes == 1
+    assert fake.api_tokens == ["token-1"]
+    assert saved["expires_at"] > time() + 3000
+
+
+def test_rejected_token_is_refreshed_and_retried_once(tmp_path, monkeypatch):
+    fake = FakeZoho()
+    # No expiry recorded, so the token is trusted until Zoho rejects it
+    tokens = {"access_token": "revoked", "refresh_token": "r"}
+
+    async def scenario(zoho):
+        return await zoho.find_invoice("ref")
+
+    assert (
+        asyncio.run(run_against(fake, tokens, scenario, tmp_path, monkeypatch)) is None
+    )
+    assert fake.refreshes == 1
+    assert fake.api_tokens == ["revoked", "token-1"]